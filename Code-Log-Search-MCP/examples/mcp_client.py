@@ -1,22 +1,44 @@
 #!/usr/bin/env python3
+import asyncio
 import json
 import os
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List
 
-import requests
+import httpx
 
 
 BASE = os.environ.get("CLS_URL", "http://127.0.0.1:7080/mcp")
+HEADERS = {"Accept": "application/json"}
+
+try:
+    # HTTP/2 needs the optional h2 package (pip install 'httpx[http2]').
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+# One pooled client for every call: keep-alive avoids a fresh TCP (and TLS)
+# handshake per JSON-RPC request.
+client = httpx.Client(http2=HTTP2, headers=HEADERS, timeout=30.0)
 
 
 def post(payload: Dict[str, Any]):
-    headers = {"Accept": "application/json", "Content-Type": "application/json"}
-    r = requests.post(BASE, headers=headers, data=json.dumps(payload))
+    r = client.post(BASE, json=payload)
     r.raise_for_status()
     return r.json()
 
 
+async def post_many(payloads: List[Dict[str, Any]]) -> List[Any]:
+    """Send several JSON-RPC requests concurrently over one pooled async client."""
+    async with httpx.AsyncClient(http2=HTTP2, headers=HEADERS, timeout=30.0) as aclient:
+        async def one(payload: Dict[str, Any]):
+            r = await aclient.post(BASE, json=payload)
+            r.raise_for_status()
+            return r.json()
+        return await asyncio.gather(*(one(p) for p in payloads))
+
+
 def main():
     print("Initialize…")
     init = post({"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {"protocolVersion": "2025-06-18", "capabilities": {}, "clientInfo": {"name": "example", "version": "1"}}})
@@ -36,7 +58,14 @@ def main():
     })
     print(json.dumps(call, indent=2))
 
+    print("\nConcurrent probes…")
+    probes = asyncio.run(post_many([
+        {"jsonrpc": "2.0", "id": 10 + i, "method": "tools/call", "params": {"name": "search_code", "arguments": {"query": q, "root": root, "maxResults": 5}}}
+        for i, q in enumerate(["TODO", "FIXME"])
+    ]))
+    print(json.dumps(probes, indent=2))
+    client.close()
+
 
 if __name__ == "__main__":
     main()
-
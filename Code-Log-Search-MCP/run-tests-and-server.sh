@@ -180,8 +180,8 @@ print(f"  uvicorn: {uvicorn.__version__}")
 PY
 fi
 # Check ripgrep for search_code
-if [ ! -x /usr/bin/rg ]; then
-  echo "ERROR: ripgrep not found at /usr/bin/rg (required for search_code)." >&2
+if [ ! -x /usr/bin/rg ] && ! command -v rg >/dev/null 2>&1; then
+  echo "ERROR: ripgrep (rg) not found at /usr/bin/rg or on PATH (required for search_code)." >&2
   echo "       Install with your package manager, e.g.: sudo apt install ripgrep" >&2
   exit 2
 fi
@@ -1,40 +1,118 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
+import contextlib
+import hmac
 import json
 import os
 import logging
+import threading
+import time
 from pathlib import Path
 from typing import List, Optional, Dict, Any
 
 try:
-    from fastapi import FastAPI, Request
-    from fastapi.responses import JSONResponse, StreamingResponse, HTMLResponse
+    from fastapi import Depends, FastAPI, Request
+    from fastapi.middleware.gzip import GZipMiddleware
+    from fastapi.responses import JSONResponse, StreamingResponse, Response
+    from pydantic import BaseModel
     import uvicorn
 except Exception:
     print("Missing dependencies: fastapi, uvicorn")
     print("Create a venv and: pip install fastapi uvicorn")
     raise SystemExit(1)
 
+try:
+    # Optional: C-accelerated JSON encoding for hot response paths.
+    import orjson
+except Exception:
+    orjson = None
+
 try:
     # When run as a module (python -m server.app)
-    from .search import perform_code_search, perform_logs_search
+    from .search import CodeHit, perform_code_search, perform_code_search_stream, perform_logs_search, rg_path, warm_tree
 except Exception:
     # When run as a script (python server/app.py)
-    from server.search import perform_code_search, perform_logs_search
+    from server.search import CodeHit, perform_code_search, perform_code_search_stream, perform_logs_search, rg_path, warm_tree
+
+
+class SearchCodeRequest(BaseModel):
+    query: Optional[str] = ''
+    root: Optional[str] = None
+    globs: Optional[List[str]] = None
+    maxResults: int = 100
+    contextLines: int = 0
+    literal: bool = False
+    timeoutMs: Optional[int] = None
+
+
+class SearchLogsRequest(BaseModel):
+    query: Optional[str] = ''
+    date: Optional[str] = None
+    mode: Optional[str] = None
+    maxResults: int = 200
+    scanAll: bool = False
+    newestFirst: bool = False
+
+
+def _plain(obj: Any) -> Any:
+    # stdlib fallback for objects orjson encodes natively (CodeHit dataclasses).
+    to_dict = getattr(obj, 'to_dict', None)
+    if to_dict is None:
+        raise TypeError(f'{type(obj).__name__} is not JSON serializable')
+    return to_dict()
+
 
+def _dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=_plain).encode('utf-8')
 
-def _auth_ok(request: Request) -> bool:
-    token = os.environ.get('CLS_TOKEN')
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed.
+
+    Content may hold CodeHit objects directly; they are encoded without an
+    intermediate dict per hit.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return _dumps(content)
+
+
+# Pre-encoded SSE framing: events are yielded as bytes so Starlette writes
+# them straight to the transport without a per-chunk str encode.
+_SSE_MESSAGE = b'event: message\ndata: '
+_SSE_BATCH = b'event: batch\ndata: '
+_SSE_PING = b'event: ping\ndata: '
+_SSE_END = b'event: end\ndata: '
+_SSE_ERROR = b'event: error\ndata: '
+_SSE_EOL = b'\n\n'
+
+
+def _load_token() -> bytes:
+    return (os.environ.get('CLS_TOKEN') or '').strip().encode('utf-8')
+
+
+def _auth_ok(request: Request, token: bytes) -> bool:
     if not token:
         return True
     hdr = request.headers.get('Authorization')
     if not hdr or not hdr.startswith('Bearer '):
         return False
-    return hdr.split(' ', 1)[1].strip() == token.strip()
+    return hmac.compare_digest(hdr[7:].strip().encode('utf-8'), token)
+
+
+class Unauthorized(Exception):
+    """Raised by the auth dependency; rendered as a 401 JSON error."""
 
 
 def create_app(default_code_root: Path, logs_root: Path) -> FastAPI:
     app = FastAPI()
+    # Hit lists are highly repetitive JSON; compress anything over 1 KB.
+    app.add_middleware(GZipMiddleware, minimum_size=1024)
+    # Read CLS_TOKEN once; requests only pay a constant-time compare.
+    token = _load_token()
     # Basic logging (stdout). Control with CLS_LOG_LEVEL (e.g., DEBUG, INFO, WARNING).
     lvl = os.environ.get('CLS_LOG_LEVEL', 'INFO').upper()
     logging.basicConfig(level=getattr(logging, lvl, logging.INFO), format='[%(levelname)s] %(message)s')
@@ -72,75 +150,199 @@ def create_app(default_code_root: Path, logs_root: Path) -> FastAPI:
     except Exception as e:
         LOG.warning('Failed to initialize file logging: %s', e)
 
+    # search_code shells out to ripgrep; surface a missing binary at startup.
+    rg = rg_path()
+    if rg:
+        LOG.info('ripgrep: %s', rg)
+    else:
+        LOG.warning('ripgrep (rg) not found on PATH; search_code will fail until it is installed')
+    # CLS_PREWARM=1: walk the code root once in the background so early searches
+    # don't pay for a cold page cache.
+    if rg and os.environ.get('CLS_PREWARM', '0') in ('1', 'true', 'TRUE'):
+        threading.Thread(target=warm_tree, args=(default_code_root,), name='cls-prewarm', daemon=True).start()
+
+    @app.exception_handler(Unauthorized)
+    async def unauthorized(request: Request, exc: Unauthorized):
+        return JSONResponse({'error': 'unauthorized'}, status_code=401)
+
+    async def require_auth(request: Request):
+        if not _auth_ok(request, token):
+            raise Unauthorized()
+
+    auth = [Depends(require_auth)]
+
+    # Requested roots must resolve inside default_code_root. The allowed root is
+    # resolved once; each request's root is resolved afresh, since a symlink
+    # under the root can be re-pointed elsewhere at any time.
+    allowed_root = os.path.realpath(str(default_code_root))
+    allowed_prefix = allowed_root.rstrip(os.sep) + os.sep
+
+    def _sanitize_root(requested: Optional[str]) -> Optional[Path]:
+        if not requested:
+            return Path(allowed_root)
+        try:
+            rp = os.path.realpath(requested)
+        except (OSError, ValueError):
+            return None
+        if rp == allowed_root or rp.startswith(allowed_prefix):
+            return Path(rp)
+        return None
+
     @app.get('/healthz')
     def healthz():
         return {'ok': True, 'code_root': str(default_code_root), 'logs_root': str(logs_root)}
 
-    @app.post('/actions/search_code')
-    async def search_code(req: Request):
-        if not _auth_ok(req):
-            return JSONResponse({'error': 'unauthorized'}, status_code=401)
-        body = await req.json()
-        query = body.get('query') or ''
-        root_in = body.get('root')
-        root_path = _sanitize_root(root_in)
+    @app.post('/actions/search_code', dependencies=auth)
+    async def search_code(body: SearchCodeRequest):
+        query = body.query or ''
+        root_path = _sanitize_root(body.root)
         if root_path is None:
             return JSONResponse({'error': 'forbidden_root', 'message': 'root must be within default_code_root'}, status_code=400)
-        globs = body.get('globs') or []
-        max_results = int(body.get('maxResults', 100))
-        context_lines = int(body.get('contextLines', 0))
-        literal = bool(body.get('literal', False))
-        timeout_ms = body.get('timeoutMs')
+        globs = body.globs or []
+        max_results = body.maxResults
+        context_lines = body.contextLines
+        literal = body.literal
+        timeout_ms = body.timeoutMs
         LOG.debug('search_code query=%r root=%s max=%d ctx=%d literal=%s timeoutMs=%s', query, root_path, max_results, context_lines, literal, timeout_ms)
-        hits = perform_code_search(query, root_path, globs, max_results, context_lines, literal=literal, timeout_ms=timeout_ms)
-        return JSONResponse({'hits': [h.__dict__ for h in hits]})
+        # rg and file I/O block: run them off the event loop.
+        hits = await asyncio.to_thread(perform_code_search, query, root_path, globs, max_results, context_lines,
+                                       literal=literal, timeout_ms=timeout_ms)
+        return ORJSONResponse({'hits': hits})
 
-    @app.get('/sse/search_code_stream')
-    async def search_code_stream(request: Request, query: str, root: Optional[str] = None, maxResults: int = 200, durationSec: int = 20):
-        if not _auth_ok(request):
-            return JSONResponse({'error': 'unauthorized'}, status_code=401)
+    @app.get('/sse/search_code_stream', dependencies=auth)
+    async def search_code_stream(request: Request, query: str, root: Optional[str] = None, maxResults: int = 200, durationSec: int = 20,
+                                 batch: bool = False):
         rp = _sanitize_root(root or str(default_code_root))
         if rp is None:
             return JSONResponse({'error': 'forbidden_root', 'message': 'root must be within default_code_root'}, status_code=400)
 
-        def event_stream():
+        async def event_stream():
+            # Async generator: Starlette iterates it on the event loop instead of
+            # offloading every chunk to the threadpool. rg runs as an asyncio
+            # subprocess read by a producer task that feeds a bounded queue, so hits
+            # go out as soon as they are found and a slow client applies
+            # backpressure to rg.
+            loop = asyncio.get_running_loop()
+            queue: asyncio.Queue = asyncio.Queue(maxsize=64)
+            done, ping = object(), object()
+
+            async def produce():
+                try:
+                    # aclosing: a cancelled producer still closes the search
+                    # generator here, which kills and reaps rg.
+                    async with contextlib.aclosing(
+                        perform_code_search_stream(query, rp, None, maxResults, 0, literal=False)
+                    ) as hits:
+                        async for h in hits:
+                            await queue.put(h)
+                except Exception as e:
+                    await queue.put(e)
+                await queue.put(done)
+
+            # Timers run on the loop, so the per-hit path never reads the clock:
+            # heartbeats are queued only while idle; expiry sets a flag and wakes
+            # an idle consumer.
+            expired = False
+
+            def expire():
+                nonlocal expired
+                expired = True
+                if queue.empty():
+                    queue.put_nowait(ping)
+
+            def beat():
+                nonlocal beat_timer
+                if queue.empty():
+                    queue.put_nowait(ping)
+                beat_timer = loop.call_later(5.0, beat)
+
+            beat_timer = loop.call_later(5.0, beat)
+            expire_timer = loop.call_later(durationSec, expire)
+            producer = asyncio.create_task(produce())
             try:
-                import time
-                start = time.time()
                 sent = 0
-                last_ping = 0.0
-                hits = perform_code_search(query, rp, None, maxResults, 0, literal=False, timeout_ms=int(durationSec * 1000))
-                for h in hits:
-                    # Heartbeat
-                    now = time.time()
-                    if now - last_ping > 5.0:
-                        yield "event: ping\n" + f"data: {{\"t\": {int(now)} }}\n\n"
-                        last_ping = now
-                    yield f"event: message\n" + f"data: {json.dumps(h.__dict__, ensure_ascii=False)}\n\n"
-                    sent += 1
-                    if sent >= maxResults or (now - start) >= durationSec:
+                next_check = 32
+                pending = None
+                yield b''.join((_SSE_PING, b'{"t":%d}' % int(time.time()), _SSE_EOL))
+                while True:
+                    h = pending if pending is not None else await queue.get()
+                    pending = None
+                    if h is done:
+                        break
+                    if h is ping:
+                        if expired:
+                            break
+                        if await request.is_disconnected():
+                            return
+                        yield b''.join((_SSE_PING, b'{"t":%d}' % int(time.time()), _SSE_EOL))
+                        continue
+                    if isinstance(h, Exception):
+                        raise h
+                    if batch:
+                        # Coalesce up to 32 hits, or whatever arrives within 20 ms,
+                        # into one frame.
+                        hits = [h]
+                        flush_at = loop.time() + 0.02
+                        while len(hits) < 32 and sent + len(hits) < maxResults:
+                            if queue.empty():
+                                wait = flush_at - loop.time()
+                                if wait <= 0:
+                                    break
+                                try:
+                                    nxt = await asyncio.wait_for(queue.get(), wait)
+                                except asyncio.TimeoutError:
+                                    break
+                            else:
+                                nxt = queue.get_nowait()
+                            if not isinstance(nxt, CodeHit):
+                                pending = nxt
+                                break
+                            hits.append(nxt)
+                        yield b''.join((_SSE_BATCH, _dumps(hits), _SSE_EOL))
+                        sent += len(hits)
+                    else:
+                        yield b''.join((_SSE_MESSAGE, h.to_json_bytes(), _SSE_EOL))
+                        sent += 1
+                    if sent >= maxResults or expired:
                         break
-                yield f"event: end\n" + f"data: {json.dumps({'count': sent})}\n\n"
+                    # Stop rg promptly if the client went away mid-burst.
+                    if sent >= next_check:
+                        next_check = sent + 32
+                        if await request.is_disconnected():
+                            return
+                    await asyncio.sleep(0)
+                yield b''.join((_SSE_END, _dumps({'count': sent}), _SSE_EOL))
             except Exception as e:
-                yield f"event: error\n" + f"data: {json.dumps({'error': str(e)})}\n\n"
-        return StreamingResponse(event_stream(), media_type='text/event-stream')
-
-    @app.post('/actions/search_logs')
-    async def search_logs(req: Request):
-        if not _auth_ok(req):
-            return JSONResponse({'error': 'unauthorized'}, status_code=401)
-        body = await req.json()
-        query = body.get('query') or ''
-        date = body.get('date')
-        mode = body.get('mode')
-        max_results = int(body.get('maxResults', 200))
-        LOG.debug('search_logs query=%r date=%r mode=%r max=%d', query, date, mode, max_results)
-        results = perform_logs_search(query, logs_root, date=date, mode=mode, max_results=max_results)
-        return JSONResponse({'entries': results})
+                yield b''.join((_SSE_ERROR, _dumps({'error': str(e)}), _SSE_EOL))
+            finally:
+                # Wait for the cancelled producer so rg is killed and waited for
+                # before the response ends, not later by the garbage collector.
+                beat_timer.cancel()
+                expire_timer.cancel()
+                producer.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await producer
+        # Ask proxies (nginx) not to buffer or cache the stream so events flush immediately;
+        # identity encoding keeps GZipMiddleware from holding events back to compress them.
+        headers = {'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache', 'Connection': 'keep-alive',
+                   'Content-Encoding': 'identity'}
+        return StreamingResponse(event_stream(), media_type='text/event-stream; charset=utf-8', headers=headers)
 
-    @app.get('/mcp_ui')
-    async def mcp_ui():
-        html = '''
+    @app.post('/actions/search_logs', dependencies=auth)
+    async def search_logs(body: SearchLogsRequest):
+        query = body.query or ''
+        date = body.date
+        mode = body.mode
+        max_results = body.maxResults
+        LOG.debug('search_logs query=%r date=%r mode=%r max=%d all=%s newest=%s', query, date, mode, max_results,
+                  body.scanAll, body.newestFirst)
+        results = await asyncio.to_thread(perform_logs_search, query, logs_root, date=date, mode=mode,
+                                          max_results=max_results, scan_all=body.scanAll,
+                                          newest_first=body.newestFirst)
+        return ORJSONResponse({'entries': results})
+
+    # Static page: encode it once rather than per request.
+    mcp_ui_html = '''
         <!DOCTYPE html>
         <html>
         <head>
@@ -213,8 +415,11 @@ def create_app(default_code_root: Path, logs_root: Path) -> FastAPI:
           </script>
         </body>
         </html>
-        '''
-        return HTMLResponse(content=html)
+        '''.encode('utf-8')
+
+    @app.get('/mcp_ui')
+    async def mcp_ui():
+        return Response(content=mcp_ui_html, media_type='text/html')
 
     # ---- MCP Streamable HTTP endpoint ----
     def mcp_tools() -> List[Dict[str, Any]]:
@@ -254,7 +459,9 @@ def create_app(default_code_root: Path, logs_root: Path) -> FastAPI:
                         'query': {'type': 'string'},
                         'date': {'type': ['string','null'], 'description': 'YYYYMMDD file name stem'},
                         'mode': {'type': ['string','null'], 'description': 'Optional mode filter (e.g., brainstorm).'},
-                        'maxResults': {'type': 'integer', 'default': 200, 'minimum': 1, 'maximum': 10000}
+                        'maxResults': {'type': 'integer', 'default': 200, 'minimum': 1, 'maximum': 10000},
+                        'scanAll': {'type': 'boolean', 'default': False, 'description': 'Without date, search every log file (oldest first) instead of only the newest.'},
+                        'newestFirst': {'type': 'boolean', 'default': False, 'description': 'Return the most recent entries first (reads logs from the end).'}
                     },
                     'required': ['query']
                 },
@@ -268,6 +475,9 @@ def create_app(default_code_root: Path, logs_root: Path) -> FastAPI:
             },
         ]
 
+    # The tool list is static for the app's lifetime.
+    tools = mcp_tools()
+
     def _mcp_response(id_value, result=None, error=None):
         if error is not None:
             return {'jsonrpc': '2.0', 'id': id_value, 'error': error}
@@ -275,16 +485,13 @@ def create_app(default_code_root: Path, logs_root: Path) -> FastAPI:
 
     def _text_and_structured(obj: Dict[str, Any]) -> Dict[str, Any]:
         return {
-            'content': [{'type': 'text', 'text': json.dumps(obj, ensure_ascii=False)}],
+            'content': [{'type': 'text', 'text': _dumps(obj).decode('utf-8')}],
             'structuredContent': obj,
             'isError': False,
         }
 
-    @app.post('/mcp')
+    @app.post('/mcp', dependencies=auth)
     async def mcp(req: Request):
-        if not _auth_ok(req):
-            return JSONResponse({'error': 'unauthorized'}, status_code=401)
-
         try:
             body = await req.json()
         except Exception:
@@ -305,7 +512,7 @@ def create_app(default_code_root: Path, logs_root: Path) -> FastAPI:
                 })
 
             if method == 'tools/list':
-                return _mcp_response(msg_id, result={'tools': mcp_tools()})
+                return _mcp_response(msg_id, result={'tools': tools})
 
             if method == 'tools/call':
                 name = (params or {}).get('name')
@@ -323,15 +530,21 @@ def create_app(default_code_root: Path, logs_root: Path) -> FastAPI:
                         literal = bool(arguments.get('literal') or False)
                         timeout_ms = arguments.get('timeoutMs')
                         LOG.debug('mcp tools/call search_code q=%r root=%s max=%d ctx=%d literal=%s timeoutMs=%s', q, root_sanitized, max_results, context_lines, literal, timeout_ms)
-                        hits = perform_code_search(q, root_sanitized, globs, max_results, context_lines, literal=literal, timeout_ms=timeout_ms)
-                        return _mcp_response(msg_id, result=_text_and_structured({'hits': [h.__dict__ for h in hits]}))
+                        hits = await asyncio.to_thread(perform_code_search, q, root_sanitized, globs, max_results, context_lines,
+                                                       literal=literal, timeout_ms=timeout_ms)
+                        return _mcp_response(msg_id, result=_text_and_structured({'hits': hits}))
                     elif name == 'search_logs':
                         q = arguments.get('query') or ''
                         date = arguments.get('date')
                         mode = arguments.get('mode')
                         max_results = int(arguments.get('maxResults') or 200)
-                        LOG.debug('mcp tools/call search_logs q=%r date=%r mode=%r max=%d', q, date, mode, max_results)
-                        entries = perform_logs_search(q, logs_root, date=date, mode=mode, max_results=max_results)
+                        scan_all = bool(arguments.get('scanAll') or False)
+                        newest_first = bool(arguments.get('newestFirst') or False)
+                        LOG.debug('mcp tools/call search_logs q=%r date=%r mode=%r max=%d all=%s newest=%s', q, date, mode,
+                                  max_results, scan_all, newest_first)
+                        entries = await asyncio.to_thread(perform_logs_search, q, logs_root, date=date, mode=mode,
+                                                          max_results=max_results, scan_all=scan_all,
+                                                          newest_first=newest_first)
                         return _mcp_response(msg_id, result=_text_and_structured({'entries': entries}))
                     else:
                         return _mcp_response(msg_id, error={'code': -32602, 'message': f'Unknown tool: {name}'})
@@ -341,132 +554,132 @@ def create_app(default_code_root: Path, logs_root: Path) -> FastAPI:
             return _mcp_response(msg_id, error={'code': -32601, 'message': f'Unknown method: {method}'})
 
         if isinstance(body, list):
-            out = []
-            for m in body:
-                r = await handle_one(m)
-                if r is not None:
-                    out.append(r)
-            return JSONResponse(out) if out else JSONResponse(status_code=202, content=None)
+            # Tool calls run in worker threads, so a batch takes as long as its
+            # slowest call rather than the sum; gather keeps the request order.
+            results = await asyncio.gather(*(handle_one(m) for m in body))
+            out = [r for r in results if r is not None]
+            return ORJSONResponse(out) if out else ORJSONResponse(status_code=202, content=None)
         elif isinstance(body, dict):
             r = await handle_one(body)
-            return JSONResponse(r) if r is not None else JSONResponse(status_code=202, content=None)
+            return ORJSONResponse(r) if r is not None else ORJSONResponse(status_code=202, content=None)
         return JSONResponse({'error': 'invalid payload'}, status_code=400)
 
+    # The search page only depends on default_code_root: render it once.
+    search_html = f'''
+    <!DOCTYPE html>
+    <html>
+    <head>
+      <title>Code+Log Search</title>
+      <style>
+        body {{ font-family: system-ui, sans-serif; background: #0b1220; color: #e0e6f0; padding: 20px; }}
+        section {{ background: #111827; border: 1px solid #1f2937; border-radius: 8px; padding: 16px; margin-bottom: 16px; }}
+        label {{ display: block; margin: 6px 0; }}
+        input, textarea {{ width: 100%; background: #0b1220; color: #e0e6f0; border: 1px solid #374151; border-radius: 6px; padding: 8px; }}
+        button {{ background: #2563eb; color: white; border: 0; border-radius: 6px; padding: 8px 12px; cursor: pointer; margin-right: 6px; }}
+        pre {{ background: #0b1220; border: 1px solid #1f2937; border-radius: 8px; padding: 10px; max-height: 50vh; overflow: auto; }}
+      </style>
+    </head>
+    <body>
+      <h1>Code + Log Search MCP</h1>
+      <section>
+        <h2>Code Search</h2>
+        <label>Query <input id="q" placeholder="e.g., num_predict"/></label>
+        <label>Root <input id="root" value="{str(default_code_root)}"/></label>
+        <label>Globs (comma-separated) <input id="globs" placeholder="e.g., *.py,*.md"/></label>
+        <label>maxResults <input id="maxResults" value="100"/></label>
+        <label>contextLines <input id="contextLines" value="0"/></label>
+        <button onclick="codeSearch()">Search</button>
+        <button onclick="codeStream()">Stream</button>
+        <pre id="codeOut">(no results)</pre>
+      </section>
+      <section>
+        <h2>Log Search</h2>
+        <label>Query <input id="lq" placeholder="e.g., brainstorm"/></label>
+        <label>Date (YYYYMMDD, optional) <input id="ldate"/></label>
+        <label>Mode (optional) <input id="lmode" placeholder="brainstorm|probe|judge|legacy"/></label>
+        <label>maxResults <input id="lmax" value="200"/></label>
+        <button onclick="logSearch()">Search Logs</button>
+        <pre id="logOut">(no results)</pre>
+      </section>
+      <script>
+        function j(o){{return JSON.stringify(o,null,2);}}
+        async function codeSearch(){{
+          const body={{
+            query:document.getElementById('q').value,
+            root:document.getElementById('root').value,
+            maxResults:parseInt(document.getElementById('maxResults').value||'100'),
+            contextLines:parseInt(document.getElementById('contextLines').value||'0')
+          }};
+          const globs=document.getElementById('globs').value.trim();
+          if(globs) body.globs=globs.split(',').map(s=>s.trim()).filter(Boolean);
+          const r=await fetch('/actions/search_code',{{method:'POST',headers:headers(),body:JSON.stringify(body)}});
+          document.getElementById('codeOut').textContent=j(await r.json());
+        }}
+        function codeStream(){{
+          const q=document.getElementById('q').value; const root=document.getElementById('root').value; const out=document.getElementById('codeOut'); out.textContent='';
+          const es=new EventSource('/sse/search_code_stream?batch=1&query='+encodeURIComponent(q)+'&root='+encodeURIComponent(root));
+          es.onmessage=(e)=>{{ out.textContent += e.data+'\n'; }};
+          es.addEventListener('batch',(e)=>{{ out.textContent += JSON.parse(e.data).map(h=>JSON.stringify(h)+'\n').join(''); }});
+          es.addEventListener('end',(e)=>{{ out.textContent += '\n[END] '+e.data; es.close(); }});
+          es.addEventListener('error',(e)=>{{ out.textContent += '\n[ERROR]'; es.close(); }});
+        }}
+        async function logSearch(){{
+          const body={{query:document.getElementById('lq').value}};
+          const d=document.getElementById('ldate').value.trim(); if(d) body.date=d;
+          const m=document.getElementById('lmode').value.trim(); if(m) body.mode=m;
+          body.maxResults=parseInt(document.getElementById('lmax').value||'200');
+          const r=await fetch('/actions/search_logs',{{method:'POST',headers:headers(),body:JSON.stringify(body)}});
+          document.getElementById('logOut').textContent=j(await r.json());
+        }}
+        function headers(){{
+          const t = localStorage.getItem('CLS_TOKEN') || '';
+          const h = {{'Content-Type':'application/json'}};
+          if (t) h['Authorization'] = 'Bearer '+t;
+          return h;
+        }}
+      </script>
+    </body>
+    </html>
+    '''.encode('utf-8')
+
     @app.get('/search')
     async def search_ui():
-        html = f'''
-        <!DOCTYPE html>
-        <html>
-        <head>
-          <title>Code+Log Search</title>
-          <style>
-            body {{ font-family: system-ui, sans-serif; background: #0b1220; color: #e0e6f0; padding: 20px; }}
-            section {{ background: #111827; border: 1px solid #1f2937; border-radius: 8px; padding: 16px; margin-bottom: 16px; }}
-            label {{ display: block; margin: 6px 0; }}
-            input, textarea {{ width: 100%; background: #0b1220; color: #e0e6f0; border: 1px solid #374151; border-radius: 6px; padding: 8px; }}
-            button {{ background: #2563eb; color: white; border: 0; border-radius: 6px; padding: 8px 12px; cursor: pointer; margin-right: 6px; }}
-            pre {{ background: #0b1220; border: 1px solid #1f2937; border-radius: 8px; padding: 10px; max-height: 50vh; overflow: auto; }}
-          </style>
-        </head>
-        <body>
-          <h1>Code + Log Search MCP</h1>
-          <section>
-            <h2>Code Search</h2>
-            <label>Query <input id="q" placeholder="e.g., num_predict"/></label>
-            <label>Root <input id="root" value="{str(default_code_root)}"/></label>
-            <label>Globs (comma-separated) <input id="globs" placeholder="e.g., *.py,*.md"/></label>
-            <label>maxResults <input id="maxResults" value="100"/></label>
-            <label>contextLines <input id="contextLines" value="0"/></label>
-            <button onclick="codeSearch()">Search</button>
-            <button onclick="codeStream()">Stream</button>
-            <pre id="codeOut">(no results)</pre>
-          </section>
-          <section>
-            <h2>Log Search</h2>
-            <label>Query <input id="lq" placeholder="e.g., brainstorm"/></label>
-            <label>Date (YYYYMMDD, optional) <input id="ldate"/></label>
-            <label>Mode (optional) <input id="lmode" placeholder="brainstorm|probe|judge|legacy"/></label>
-            <label>maxResults <input id="lmax" value="200"/></label>
-            <button onclick="logSearch()">Search Logs</button>
-            <pre id="logOut">(no results)</pre>
-          </section>
-          <script>
-            function j(o){{return JSON.stringify(o,null,2);}}
-            async function codeSearch(){{
-              const body={{
-                query:document.getElementById('q').value,
-                root:document.getElementById('root').value,
-                maxResults:parseInt(document.getElementById('maxResults').value||'100'),
-                contextLines:parseInt(document.getElementById('contextLines').value||'0')
-              }};
-              const globs=document.getElementById('globs').value.trim();
-              if(globs) body.globs=globs.split(',').map(s=>s.trim()).filter(Boolean);
-              const r=await fetch('/actions/search_code',{{method:'POST',headers:headers(),body:JSON.stringify(body)}});
-              document.getElementById('codeOut').textContent=j(await r.json());
-            }}
-            function codeStream(){{
-              const q=document.getElementById('q').value; const root=document.getElementById('root').value; const out=document.getElementById('codeOut'); out.textContent='';
-              const es=new EventSource('/sse/search_code_stream?query='+encodeURIComponent(q)+'&root='+encodeURIComponent(root));
-              es.onmessage=(e)=>{{ out.textContent += e.data+'\n'; }};
-              es.addEventListener('end',(e)=>{{ out.textContent += '\n[END] '+e.data; es.close(); }});
-              es.addEventListener('error',(e)=>{{ out.textContent += '\n[ERROR]'; es.close(); }});
-            }}
-            async function logSearch(){{
-              const body={{query:document.getElementById('lq').value}};
-              const d=document.getElementById('ldate').value.trim(); if(d) body.date=d;
-              const m=document.getElementById('lmode').value.trim(); if(m) body.mode=m;
-              body.maxResults=parseInt(document.getElementById('lmax').value||'200');
-              const r=await fetch('/actions/search_logs',{{method:'POST',headers:headers(),body:JSON.stringify(body)}});
-              document.getElementById('logOut').textContent=j(await r.json());
-            }}
-            function headers(){{
-              const t = localStorage.getItem('CLS_TOKEN') || '';
-              const h = {{'Content-Type':'application/json'}};
-              if (t) h['Authorization'] = 'Bearer '+t;
-              return h;
-            }}
-          </script>
-        </body>
-        </html>
-        '''
-        return html
+        return Response(content=search_html, media_type='text/html')
 
     return app
 
 
+def app_from_env() -> FastAPI:
+    """App factory for multi-worker runs; each worker rebuilds the app from env."""
+    code_root = Path(os.environ.get('CLS_CODE_ROOT', os.getcwd()))
+    logs_root = Path(os.environ.get('RN_LOG_DIR', os.path.expanduser('~/.roadnerd/logs')))
+    return create_app(code_root, logs_root)
+
+
 def main():
     ap = argparse.ArgumentParser(description='Code-Log-Search-MCP HTTP/SSE Server')
     ap.add_argument('--host', default='127.0.0.1')
     ap.add_argument('--port', type=int, default=7080)
     ap.add_argument('--default-code-root', default=os.environ.get('CLS_CODE_ROOT', os.getcwd()))
     ap.add_argument('--logs-root', default=os.environ.get('RN_LOG_DIR', os.path.expanduser('~/\.roadnerd/logs')))
-    allowed_root = default_code_root.resolve()
-
-    def _sanitize_root(requested: Optional[str]) -> Optional[Path]:
-        if not requested:
-            return allowed_root
-        try:
-            rp = Path(requested).resolve()
-        except Exception:
-            return None
-        try:
-            # Python 3.9+: use is_relative_to when available
-            if hasattr(rp, 'is_relative_to'):
-                if rp.is_relative_to(allowed_root):
-                    return rp
-                return None
-            # Fallback: raise if not relative
-            rp.relative_to(allowed_root)
-            return rp
-        except Exception:
-            return None
+    ap.add_argument('--workers', type=int, default=int(os.environ.get('CLS_WORKERS', '1')),
+                    help='uvicorn worker processes (default 1; env CLS_WORKERS)')
     args = ap.parse_args()
 
     default_code_root = Path(args.default_code_root)
     logs_root = Path(args.logs_root)
     logs_root.mkdir(parents=True, exist_ok=True)
+    # uvicorn's loop/http 'auto' picks uvloop and httptools when installed
+    # (pip install 'uvicorn[standard]') and falls back to asyncio/h11 otherwise.
+    if args.workers > 1:
+        # Worker processes import the app by name, so hand the roots over via env.
+        os.environ['CLS_CODE_ROOT'] = str(default_code_root)
+        os.environ['RN_LOG_DIR'] = str(logs_root)
+        uvicorn.run('server.app:app_from_env', factory=True, host=args.host, port=args.port,
+                    workers=args.workers, backlog=2048)
+        return
     app = create_app(default_code_root, logs_root)
-    uvicorn.run(app, host=args.host, port=args.port)
+    uvicorn.run(app, host=args.host, port=args.port, backlog=2048)
 
 
 if __name__ == '__main__':
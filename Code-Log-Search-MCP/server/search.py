@@ -1,27 +1,91 @@
 #!/usr/bin/env python3
+import asyncio
 import json
+import mmap
+import multiprocessing
 import os
 import re
+import shutil
 import subprocess
+import threading
 import time
-import select
 import contextlib
-from dataclasses import dataclass
+import itertools
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterable, List, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
 
+try:
+    # Optional: C-accelerated JSON (serializes dataclasses natively).
+    import orjson
+except Exception:
+    orjson = None
 
-@dataclass
+try:
+    # Optional: linear-time RE2 engine for log queries (pip install google-re2).
+    import re2
+except Exception:
+    re2 = None
+
+
+def _loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# Minified bundles can put megabytes on one line; previews stop here.
+PREVIEW_MAX_CHARS = 512
+_RG_OMITTED = b' [... omitted end of long line]'
+
+
+@dataclass(slots=True)
 class CodeHit:
     file: str
     line: int
-    preview: str
+    preview: str  # matched line, cut to PREVIEW_MAX_CHARS with a trailing '…'
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'file': self.file, 'line': self.line, 'preview': self.preview}
+
+    def to_json_bytes(self) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(self)
+        return json.dumps(self.to_dict(), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+@lru_cache(maxsize=1)
+def rg_path() -> Optional[str]:
+    """Locate ripgrep once: prefer /usr/bin/rg, else whatever `rg` is on PATH."""
+    if Path('/usr/bin/rg').exists():
+        return '/usr/bin/rg'
+    return shutil.which('rg')
 
 
 def _rg_available() -> bool:
-    exists = Path('/usr/bin/rg').exists()
-    print(f"rg exists: {exists}")
-    return exists
+    return rg_path() is not None
+
+
+def warm_tree(root: Path) -> None:
+    """List every searchable file under root once (rg --files, output
+    discarded) so the first real searches find a warm page/dentry cache."""
+    rg = rg_path()
+    if not rg or not root.exists():
+        return
+    subprocess.run([rg, '--files', '--no-require-git', str(root)],
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+
+
+# Recent code-search results, so retried or repeated queries skip rg. Entries
+# expire after _CODE_CACHE_TTL seconds, which bounds how stale a hit can be.
+_CODE_CACHE: 'OrderedDict[tuple, Tuple[float, List[CodeHit]]]' = OrderedDict()
+_CODE_CACHE_LOCK = threading.Lock()
+_CODE_CACHE_SIZE = 256
+_CODE_CACHE_TTL = 30.0
 
 
 def perform_code_search(
@@ -33,120 +97,506 @@ def perform_code_search(
     literal: bool = False,
     timeout_ms: Optional[int] = None,
 ) -> List[CodeHit]:
+    key = (query, str(root), tuple(globs or ()), max_results, context_lines, literal)
+    now = time.monotonic()
+    with _CODE_CACHE_LOCK:
+        entry = _CODE_CACHE.get(key)
+        if entry is not None:
+            if now - entry[0] < _CODE_CACHE_TTL:
+                _CODE_CACHE.move_to_end(key)
+                return list(entry[1])
+            del _CODE_CACHE[key]
+
+    hits = list(perform_code_search_iter(
+        query, root, globs, max_results, context_lines, literal=literal, timeout_ms=timeout_ms,
+    ))
+    # A search cut short by its timeout is partial: don't serve it to retries.
+    if timeout_ms and (time.monotonic() - now) * 1000 >= int(timeout_ms):
+        return hits
+    with _CODE_CACHE_LOCK:
+        _CODE_CACHE[key] = (now, hits)
+        _CODE_CACHE.move_to_end(key)
+        while len(_CODE_CACHE) > _CODE_CACHE_SIZE:
+            _CODE_CACHE.popitem(last=False)
+    return list(hits)
+
+
+# rg writes in bursts; take whatever the pipe holds (up to 1 MB) per read.
+_READ_SIZE = 1 << 20
+
+
+def _rg_command(query: str, root: Path, globs: Optional[List[str]], max_results: int,
+                context_lines: int, literal: bool) -> List[str]:
     if not _rg_available():
         raise RuntimeError('ripgrep (rg) not found on PATH')
     if not root.exists():
         raise FileNotFoundError(f'root not found: {root}')
 
-    cmd = ['/usr/bin/rg', '--json', '--no-heading', '--line-number', '--color', 'never']
+    # --no-require-git: honour .gitignore (node_modules/, build/, .venv/...) even
+    # when the root is a plain checkout or export without a .git directory.
+    cmd = [rg_path(), '--no-heading', '--line-number', '--color', 'never', '--no-require-git']
+    if context_lines > 0:
+        cmd += ['--json', '-C', str(context_lines)]
+    else:
+        # Without context, plain "path\0line:text" output is all we need and
+        # saves rg's JSON encoding and our decoding; NUL ends the path so
+        # colons in file names stay unambiguous.
+        cmd += ['--with-filename', '--null']
     if literal:
         cmd.append('-F')
-    if context_lines > 0:
-        cmd += ['-C', str(context_lines)]
     if globs:
         for g in globs:
             cmd += ['-g', g]
+    # rg's -m caps matches per file; the total cap is enforced by the readers.
+    cmd += ['-m', str(max_results), '--max-columns', str(PREVIEW_MAX_CHARS), '--max-columns-preview']
     # End of options: ensure user-supplied query is treated as positional
     cmd.append('--')
     cmd += [query, str(root)]
+    return cmd
+
+
+def _clip_preview(text: str) -> str:
+    if len(text) > PREVIEW_MAX_CHARS:
+        return text[:PREVIEW_MAX_CHARS] + '…'
+    return text
+
+
+def _parse_plain(line: bytes) -> Optional[CodeHit]:
+    """Decode one `path\\0line:text` record from rg's plain output."""
+    path, sep, rest = line.partition(b'\0')
+    if not sep:
+        return None
+    num, sep, text = rest.partition(b':')
+    if not sep or not num.isdigit():
+        return None
+    if text.endswith(_RG_OMITTED):
+        # rg already cut the line at PREVIEW_MAX_CHARS bytes.
+        preview = text[:-len(_RG_OMITTED)].decode('utf-8', 'replace') + '…'
+    else:
+        preview = _clip_preview(text.decode('utf-8', 'replace'))
+    return CodeHit(file=path.decode('utf-8', 'replace'), line=int(num), preview=preview)
+
+
+def _parse_hit(line: bytes) -> Optional[CodeHit]:
+    """Decode one rg --json record; None for anything but a usable match."""
+    # rg writes the type key first, so a prefix test rejects begin/end/context/
+    # summary records without scanning the whole line.
+    if not line.startswith(b'{"type":"match"'):
+        return None
+    try:
+        obj = _loads(line)
+    except ValueError:
+        return None
+    try:
+        data = obj['data']
+        path = data['path']['text']
+        line_number = data['line_number']
+        # Non-UTF-8 lines arrive as {"bytes": ...}; keep the hit, drop the preview.
+        preview = _clip_preview(data['lines'].get('text', '').rstrip('\n'))
+    except (KeyError, TypeError, AttributeError):
+        return None
+    if path and line_number is not None:
+        return CodeHit(file=path, line=int(line_number), preview=preview)
+    return None
+
+
+def _watch_rg(proc: subprocess.Popen, finished: threading.Event, deadline: float) -> None:
+    """Kill rg once `deadline` passes, unless the reader finishes first."""
+    if not finished.wait(max(0.0, deadline - time.monotonic())):
+        with contextlib.suppress(Exception):
+            proc.kill()
+
+
+def perform_code_search_iter(
+    query: str,
+    root: Path,
+    globs: Optional[List[str]] = None,
+    max_results: int = 100,
+    context_lines: int = 0,
+    literal: bool = False,
+    timeout_ms: Optional[int] = None,
+) -> Iterator[CodeHit]:
+    """Yield hits as ripgrep reports them; closing the iterator stops rg."""
+    cmd = _rg_command(query, root, globs, max_results, context_lines, literal)
+    parse = _parse_hit if context_lines > 0 else _parse_plain
 
+    # stderr is never read, so don't let a full stderr pipe stall rg; stdout is
+    # read straight from the fd, so skip Python's buffering layer.
     proc = subprocess.Popen(
         cmd,
         stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-        bufsize=1,
+        stderr=subprocess.DEVNULL,
+        bufsize=0,
     )
-    hits: List[CodeHit] = []
+    sent = 0
     deadline = None
     if timeout_ms and int(timeout_ms) > 0:
-        deadline = time.time() + (int(timeout_ms) / 1000.0)
+        deadline = time.monotonic() + (int(timeout_ms) / 1000.0)
+    # The read below blocks; a watchdog enforces the timeout by killing rg,
+    # which ends the read with EOF.
+    finished = threading.Event()
+    if deadline is not None:
+        threading.Thread(target=_watch_rg, args=(proc, finished, deadline), daemon=True).start()
     try:
         assert proc.stdout is not None
-        fd = proc.stdout
-        while True:
-            # Timeout check
-            if deadline and time.time() > deadline:
-                try:
-                    proc.kill()
-                finally:
-                    break
-            # Read with a short poll to avoid blocking
-            rlist, _, _ = select.select([fd], [], [], 0.1)
-            if not rlist:
-                # Process exited?
-                if proc.poll() is not None:
-                    break
-                continue
-            line = fd.readline()
-            if not line:
-                if proc.poll() is not None:
-                    break
-                continue
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                obj = json.loads(line)
-            except Exception:
-                continue
-            if obj.get('type') == 'match':
-                data = obj.get('data', {})
-                path = data.get('path', {}).get('text')
-                line_number = data.get('line_number')
-                lines = data.get('lines', {}).get('text', '').rstrip('\n')
-                if path and line_number is not None:
-                    hits.append(CodeHit(file=path, line=int(line_number), preview=lines))
-                    if len(hits) >= max_results:
+        fd = proc.stdout.fileno()
+        buf = b''
+        while sent < max_results:
+            chunk = os.read(fd, _READ_SIZE)
+            if not chunk:
+                break
+            # Split raw bytes ourselves; the partial last record waits for the next read.
+            lines = (buf + chunk).split(b'\n')
+            buf = lines.pop()
+            for line in lines:
+                hit = parse(line)
+                if hit is not None:
+                    yield hit
+                    sent += 1
+                    if sent >= max_results:
                         break
-        return hits
     finally:
-        with contextlib.suppress(Exception):
-            proc.kill()
+        finished.set()
+        # Closing our end lets rg exit on its own (EPIPE on its next write);
+        # only a child still silently walking the tree gets killed.
         with contextlib.suppress(Exception):
             if proc.stdout:
                 proc.stdout.close()
+        try:
+            proc.wait(timeout=0.1)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        # Reap rg so finished searches don't linger as zombies.
         with contextlib.suppress(Exception):
-            if proc.stderr:
-                proc.stderr.close()
-    return hits
+            proc.wait(timeout=1)
+
+
+async def perform_code_search_stream(
+    query: str,
+    root: Path,
+    globs: Optional[List[str]] = None,
+    max_results: int = 100,
+    context_lines: int = 0,
+    literal: bool = False,
+) -> AsyncIterator[CodeHit]:
+    """Async variant of perform_code_search_iter for event-loop consumers.
+
+    rg runs as an asyncio subprocess, so no thread is tied up per stream.
+    Closing (or cancelling) the generator kills rg.
+    """
+    cmd = _rg_command(query, root, globs, max_results, context_lines, literal)
+    parse = _parse_hit if context_lines > 0 else _parse_plain
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    sent = 0
+    eof = False
+    try:
+        assert proc.stdout is not None
+        buf = b''
+        while sent < max_results:
+            chunk = await proc.stdout.read(_READ_SIZE)
+            if not chunk:
+                eof = True
+                break
+            lines = (buf + chunk).split(b'\n')
+            buf = lines.pop()
+            for line in lines:
+                hit = parse(line)
+                if hit is not None:
+                    yield hit
+                    sent += 1
+                    if sent >= max_results:
+                        break
+    finally:
+        # Only kill rg if we stopped reading early: after EOF it is exiting on
+        # its own, and kill() could reap it before asyncio's child watcher does.
+        if not eof:
+            if proc.returncode is None:
+                with contextlib.suppress(ProcessLookupError):
+                    proc.kill()
+            # Drain what rg already wrote so its pipe reaches EOF and asyncio
+            # closes the transport now rather than from a finalizer.
+            while await proc.stdout.read(_READ_SIZE):
+                pass
+        await proc.wait()
+
+
+@lru_cache(maxsize=256)
+def _compile_query(query: str) -> Any:
+    """Compile a log query once (case-insensitive); invalid regexes match literally.
+
+    Uses RE2 when installed: it scans in linear time, so long lines and
+    pathological patterns cannot backtrack. Patterns RE2 does not support
+    (backreferences, lookarounds) fall back to the stdlib engine.
+    """
+    if re2 is not None:
+        try:
+            options = re2.Options()
+            options.case_sensitive = False
+            options.log_errors = False
+            return re2.compile(query, options)
+        except Exception:
+            pass
+    try:
+        return re.compile(query, re.IGNORECASE)
+    except re.error:
+        return re.compile(re.escape(query), re.IGNORECASE)
+
+
+# Constructs whose meaning differs between a str and a UTF-8 bytes pattern:
+# '.', escapes like \w/\s/\b, and negated classes match per byte, not per char.
+_BYTES_UNSAFE = re.compile(r'[.\\]|\[\^')
+
+
+@lru_cache(maxsize=256)
+def _compile_query_bytes(query: str) -> Any:
+    """Pattern matching raw UTF-8 log lines exactly as _compile_query matches
+    decoded ones, or None when the query needs the str engine."""
+    if re2 is not None:
+        # RE2 reads bytes as UTF-8, so any query behaves as it does on str.
+        try:
+            options = re2.Options()
+            options.case_sensitive = False
+            options.log_errors = False
+            return re2.compile(query.encode('utf-8'), options)
+        except Exception:
+            pass
+    if not query.isascii() or _BYTES_UNSAFE.search(query):
+        return None
+    try:
+        return re.compile(query.encode('ascii'), re.IGNORECASE)
+    except re.error:
+        return re.compile(re.escape(query).encode('ascii'), re.IGNORECASE)
+
+
+def _log_names(logs_root: Path) -> List[str]:
+    try:
+        with os.scandir(logs_root) as it:
+            return [e.name for e in it
+                    if e.name.endswith('.jsonl') and not e.name.startswith('.') and e.is_file()]
+    except FileNotFoundError:
+        return []
+
+
+def _latest_log(logs_root: Path) -> Optional[Path]:
+    """Newest YYYYMMDD.jsonl in logs_root (names sort chronologically)."""
+    names = _log_names(logs_root)
+    return logs_root / max(names) if names else None
+
+
+@lru_cache(maxsize=1)
+def _log_pool() -> ProcessPoolExecutor:
+    # spawn, not fork: the server process has threads (and locks) of its own.
+    return ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                               mp_context=multiprocessing.get_context('spawn'))
+
+
+@dataclass(slots=True)
+class _ModeIndex:
+    ino: int
+    size: int  # bytes indexed so far; always just past a newline
+    offsets: Dict[str, array]  # mode -> start offsets of its lines
+    head: bytes = b''  # first bytes of the file when indexed (up to _MODE_INDEX_HEAD)
+    lock: threading.Lock = field(default_factory=threading.Lock)  # guards size/offsets
+
+
+# Per-file mode indexes for the most recently searched logs. Log files are
+# append-only, so a grown file only needs its new lines indexed. The global
+# lock only guards the LRU; parsing holds the file's own lock, so indexing one
+# large log never blocks searches of another.
+_MODE_INDEXES: 'OrderedDict[str, _ModeIndex]' = OrderedDict()
+_MODE_INDEX_LOCK = threading.Lock()
+_MODE_INDEX_FILES = 8
+_MODE_INDEX_HEAD = 64
+
+
+def _iter_lines(mm: mmap.mmap, start: int, stop: int) -> Iterator[Tuple[int, bytes]]:
+    while start < stop:
+        nl = mm.find(b'\n', start, stop)
+        end = stop if nl < 0 else nl
+        yield start, mm[start:end]
+        start = end + 1
+
+
+def _iter_lines_reverse(mm: mmap.mmap, start: int, stop: int) -> Iterator[Tuple[int, bytes]]:
+    """_iter_lines from the last line back to the first."""
+    if stop <= start:
+        return
+    if mm[stop - 1] == 0x0A:
+        stop -= 1
+    while True:
+        nl = mm.rfind(b'\n', start, stop)
+        begin = start if nl < 0 else nl + 1
+        yield begin, mm[begin:stop]
+        if nl < 0:
+            return
+        stop = nl
+
+
+# Anchors and inline flags/lookarounds behave differently on a whole buffer
+# than on a single line, so queries using them are matched line by line.
+_BUFFER_UNSAFE = re.compile(r'[\^$]|\\[AZz]|\(\?')
+
+
+def _iter_matching_lines(mm: mmap.mmap, pattern: Any, start: int, stop: int) -> Iterator[Tuple[int, bytes]]:
+    """Lines in [start, stop) that `pattern` matches, found by searching the
+    buffer as a whole so the engine skips non-matching stretches in one call."""
+    pos = start
+    while pos < stop:
+        m = pattern.search(mm, pos, stop)
+        if m is None:
+            return
+        hit = m.start()
+        nl = mm.rfind(b'\n', pos, hit)
+        begin = pos if nl < 0 else nl + 1
+        nl = mm.find(b'\n', hit, stop)
+        end = stop if nl < 0 else nl
+        line = mm[begin:end]
+        # A match running into the next line says nothing about this one.
+        if m.end() <= end or pattern.search(line):
+            yield begin, line
+        pos = end + 1
+
+
+def _line_at(mm: mmap.mmap, off: int) -> bytes:
+    nl = mm.find(b'\n', off)
+    return mm[off:len(mm) if nl < 0 else nl]
+
+
+def _mode_offsets(target: Path, mm: mmap.mmap, ino: int, mode: str) -> Tuple[array, int]:
+    """Offsets of lines whose top-level "mode" equals `mode`, plus how far the
+    index reaches; lines past that (an unterminated tail) are not covered."""
+    key = str(target)
+    with _MODE_INDEX_LOCK:
+        idx = _MODE_INDEXES.get(key)
+        if idx is None or idx.ino != ino:
+            idx = _MODE_INDEXES[key] = _ModeIndex(ino=ino, size=0, offsets={})
+        _MODE_INDEXES.move_to_end(key)
+        while len(_MODE_INDEXES) > _MODE_INDEX_FILES:
+            _MODE_INDEXES.popitem(last=False)
+    with idx.lock:
+        # A file truncated or rewritten in place keeps its inode, and may have
+        # regrown past the indexed size: check the indexed prefix still starts
+        # the same way and still ends on a line boundary, else start over.
+        if idx.size and (idx.size > len(mm) or mm[idx.size - 1:idx.size] != b'\n'
+                         or mm[:len(idx.head)] != idx.head):
+            idx.size, idx.offsets = 0, {}
+        end = mm.rfind(b'\n', idx.size) + 1
+        if end > idx.size:
+            for off, line in _iter_lines(mm, idx.size, end):
+                try:
+                    obj = _loads(line)
+                except ValueError:
+                    continue
+                m = obj.get('mode') if isinstance(obj, dict) else None
+                if isinstance(m, str):
+                    idx.offsets.setdefault(m, array('q')).append(off)
+            idx.size = end
+            idx.head = mm[:min(end, _MODE_INDEX_HEAD)]
+        # Copy so later appends by other searches don't race our iteration.
+        return idx.offsets.get(mode, array('q'))[:], idx.size
+
+
+# Below this much data, worker start-up and result pickling outweigh the scan.
+_PARALLEL_MIN_BYTES = 8 << 20
 
 
 def perform_logs_search(query: str, logs_root: Path, date: Optional[str] = None,
-                        mode: Optional[str] = None, max_results: int = 200) -> List[dict]:
+                        mode: Optional[str] = None, max_results: int = 200,
+                        scan_all: bool = False, newest_first: bool = False) -> List[dict]:
+    """Search one day's log (date, else the newest) or, with scan_all and no
+    date, every log in chronological order; newest_first reverses the order,
+    so a small max_results stops after reading only the end of the logs."""
+    if scan_all and not date:
+        files = [logs_root / n for n in sorted(_log_names(logs_root), reverse=newest_first)]
+        if len(files) > 1 and sum(p.stat().st_size for p in files) >= _PARALLEL_MIN_BYTES:
+            ex = _log_pool()
+            futures = [ex.submit(_scan_log_file, p, query, mode, max_results, newest_first) for p in files]
+        else:
+            futures = []
+        results: List[dict] = []
+        try:
+            for i, p in enumerate(files):
+                found = futures[i].result() if futures else _scan_log_file(p, query, mode, max_results, newest_first)
+                results.extend(found[:max_results - len(results)])
+                if len(results) >= max_results:
+                    break
+        finally:
+            for fut in futures:
+                fut.cancel()
+        return results
+
     target: Optional[Path] = None
     if date:
         cand = logs_root / f'{date}.jsonl'
         if cand.exists():
             target = cand
     if target is None:
-        files = sorted(logs_root.glob('*.jsonl'))
-        if files:
-            target = files[-1]
+        target = _latest_log(logs_root)
     if target is None:
         return []
+    return _scan_log_file(target, query, mode, max_results, newest_first)
 
-    # Prepare regex for query (case-insensitive substring by default)
-    try:
-        pattern = re.compile(query, re.IGNORECASE)
-    except re.error:
-        # Fallback: escape special chars
-        pattern = re.compile(re.escape(query), re.IGNORECASE)
+
+def _scan_log_file(target: Path, query: str, mode: Optional[str], max_results: int,
+                   newest_first: bool = False) -> List[dict]:
+    pattern = _compile_query_bytes(query)
+    if pattern is None:
+        str_pattern = _compile_query(query)
+    # The mode value must appear as a JSON string somewhere in the raw line,
+    # whatever the key/colon spacing; the parsed record is checked exactly below.
+    # Skip the precheck for values a writer might escape differently.
+    mode_token = f'"{mode}"'.encode('utf-8') if mode and json.dumps(mode) == f'"{mode}"' else None
 
     results: List[dict] = []
-    with target.open(encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                obj = json.loads(line)
-            except Exception:
-                continue
-            if mode and obj.get('mode') != mode:
-                continue
-            # Match against whole JSON string for simplicity; could be improved to fields
-            if pattern.search(line):
+    with target.open('rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped.
+            return results
+        with mm:
+            if mode:
+                # Visit only lines indexed under this mode, then any unterminated tail.
+                offsets, indexed = _mode_offsets(target, mm, os.fstat(f.fileno()).st_ino, mode)
+                if newest_first:
+                    candidates = itertools.chain(
+                        _iter_lines_reverse(mm, indexed, len(mm)),
+                        ((off, _line_at(mm, off)) for off in reversed(offsets)),
+                    )
+                else:
+                    candidates = itertools.chain(
+                        ((off, _line_at(mm, off)) for off in offsets),
+                        _iter_lines(mm, indexed, len(mm)),
+                    )
+            elif newest_first:
+                candidates = _iter_lines_reverse(mm, 0, len(mm))
+            elif pattern is not None and not _BUFFER_UNSAFE.search(query):
+                candidates = _iter_matching_lines(mm, pattern, 0, len(mm))
+            else:
+                candidates = _iter_lines(mm, 0, len(mm))
+            # Nothing is decoded unless it matches.
+            for _, line in candidates:
+                # Match against the whole raw JSON line and only parse survivors.
+                if pattern is not None:
+                    if not pattern.search(line):
+                        continue
+                elif not str_pattern.search(line.decode('utf-8', 'replace')):
+                    continue
+                if mode_token and mode_token not in line:
+                    continue
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    obj = _loads(line)
+                except ValueError:
+                    continue
+                if mode and obj.get('mode') != mode:
+                    continue
                 results.append(obj)
                 if len(results) >= max_results:
                     break
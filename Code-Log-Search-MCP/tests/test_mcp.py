@@ -1,3 +1,4 @@
+import gc
 import sys
 from pathlib import Path
 
@@ -117,3 +118,85 @@ def test_rest_forbidden_root(tmp_path: Path):
     r = client.post('/actions/search_code', json={'query': 'x', 'root': '/'})
     assert r.status_code == 400
     assert r.json().get('error') == 'forbidden_root'
+
+    # Sibling with a shared name prefix, and a symlink escaping the root.
+    sibling = tmp_path / 'proj2'
+    sibling.mkdir()
+    (code_root / 'escape').symlink_to(sibling)
+    for bad in (str(sibling), str(code_root / 'escape'), str(code_root / '..')):
+        r = client.post('/actions/search_code', json={'query': 'x', 'root': bad})
+        assert r.status_code == 400, bad
+
+    (code_root / 'sub').mkdir()
+    r = client.post('/actions/search_code', json={'query': 'x', 'root': str(code_root / 'sub')})
+    assert r.status_code == 200
+
+    # A symlink that passed once is re-checked after it is re-pointed outside.
+    (code_root / 'link').symlink_to(code_root / 'sub')
+    assert client.post('/actions/search_code', json={'query': 'x', 'root': str(code_root / 'link')}).status_code == 200
+    (code_root / 'link').unlink()
+    (code_root / 'link').symlink_to(sibling)
+    assert client.post('/actions/search_code', json={'query': 'x', 'root': str(code_root / 'link')}).status_code == 400
+
+
+def test_bearer_token_required(tmp_path: Path, monkeypatch):
+    require_fastapi()
+    from fastapi.testclient import TestClient
+    root = Path(__file__).resolve().parents[1]
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+    from server.app import create_app
+
+    monkeypatch.setenv('CLS_TOKEN', 'sekret')
+    app = create_app(tmp_path, tmp_path / 'logs')
+    client = TestClient(app)
+
+    init = {'jsonrpc': '2.0', 'id': 1, 'method': 'initialize', 'params': {}}
+    assert client.post('/mcp', json=init).status_code == 401
+    assert client.post('/mcp', json=init, headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    ok = client.post('/mcp', json=init, headers={'Authorization': 'Bearer sekret'})
+    assert ok.status_code == 200
+
+
+def test_large_responses_are_gzipped(tmp_path: Path):
+    require_fastapi()
+    from fastapi.testclient import TestClient
+
+    root = Path(__file__).resolve().parents[1]
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+    from server.app import create_app
+
+    app = create_app(tmp_path, tmp_path)
+    client = TestClient(app)
+
+    r = client.post('/mcp', json={'jsonrpc': '2.0', 'id': 1, 'method': 'tools/list'},
+                    headers={'Accept-Encoding': 'gzip'})
+    assert r.status_code == 200
+    assert r.headers.get('content-encoding') == 'gzip'
+    assert r.json()['result']['tools']
+
+
+@pytest.mark.filterwarnings("error::pytest.PytestUnraisableExceptionWarning")
+def test_sse_client_leaving_early_shuts_rg_down(tmp_path: Path):
+    require_fastapi()
+    from fastapi.testclient import TestClient
+
+    root = Path(__file__).resolve().parents[1]
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+    from server.app import create_app
+
+    code_root = tmp_path / 'proj'
+    code_root.mkdir()
+    for i in range(200):
+        (code_root / f'f{i}.txt').write_text('needle\n' * 2000)
+
+    with TestClient(create_app(code_root, tmp_path / 'logs')) as client:
+        params = {'query': 'needle', 'maxResults': 100000}
+        with client.stream('GET', '/sse/search_code_stream', params=params) as r:
+            for line in r.iter_lines():
+                if line.startswith('data') and '"file"' in line:
+                    break
+    # rg's pipe transport must be closed before the loop is, not by a finalizer.
+    gc.collect()
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import sys
 from pathlib import Path
@@ -7,7 +8,7 @@ ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from server.search import perform_code_search, perform_logs_search
+from server.search import perform_code_search, perform_code_search_iter, perform_code_search_stream, perform_logs_search
 
 
 def test_perform_code_search(tmp_path: Path):
@@ -25,6 +26,76 @@ def test_perform_code_search(tmp_path: Path):
     assert len(hits_lit) >= 1
 
 
+def test_perform_code_search_serves_repeats_from_cache(tmp_path: Path, monkeypatch):
+    import server.search as search
+
+    root = tmp_path / "proj"
+    root.mkdir()
+    (root / "a.txt").write_text("needle\n")
+    first = perform_code_search("needle", root, max_results=5)
+    assert len(first) == 1
+
+    def no_rg(*args, **kwargs):
+        raise AssertionError("rg should not run for a cached query")
+
+    monkeypatch.setattr(search.subprocess, "Popen", no_rg)
+    assert perform_code_search("needle", root, max_results=5) == first
+
+
+def test_perform_code_search_iter_respects_max(tmp_path: Path):
+    root = tmp_path / "proj"
+    root.mkdir()
+    (root / "a.txt").write_text("needle\n" * 50)
+
+    it = perform_code_search_iter("needle", root, max_results=3)
+    first = next(it)
+    assert first.line == 1 and first.preview == "needle"
+    assert len(list(it)) == 2
+
+
+def test_perform_code_search_plain_output_keeps_colons(tmp_path: Path):
+    root = tmp_path / "proj"
+    root.mkdir()
+    (root / "a:12:b.txt").write_text("x\nkey: needle: value\n")
+
+    hits = list(perform_code_search_iter("needle", root, max_results=5))
+    assert [(Path(h.file).name, h.line, h.preview) for h in hits] == [("a:12:b.txt", 2, "key: needle: value")]
+
+
+def test_perform_code_search_clips_long_previews(tmp_path: Path):
+    root = tmp_path / "proj"
+    root.mkdir()
+    (root / "min.js").write_text("x" * 5000 + " needle\nshort needle\n")
+
+    for ctx in (0, 1):
+        hits = perform_code_search("needle", root, max_results=5, context_lines=ctx)
+        assert [len(h.preview) for h in hits] == [513, 12]
+        assert hits[0].preview.endswith("x…")
+
+
+def test_perform_code_search_skips_gitignored(tmp_path: Path):
+    root = tmp_path / "proj"
+    (root / "build").mkdir(parents=True)
+    (root / ".gitignore").write_text("build/\n")
+    (root / "main.py").write_text("needle\n")
+    (root / "build" / "gen.py").write_text("needle\n")
+
+    hits = perform_code_search("needle", root, max_results=10)
+    assert [Path(h.file).name for h in hits] == ["main.py"]
+
+
+def test_perform_code_search_stream(tmp_path: Path):
+    root = tmp_path / "proj"
+    root.mkdir()
+    (root / "a.txt").write_text("needle\n" * 20)
+
+    async def collect():
+        return [h async for h in perform_code_search_stream("needle", root, max_results=4)]
+
+    hits = asyncio.run(collect())
+    assert [h.line for h in hits] == [1, 2, 3, 4]
+
+
 def test_perform_logs_search(tmp_path: Path):
     logs = tmp_path / "logs"
     logs.mkdir()
@@ -34,3 +105,143 @@ def test_perform_logs_search(tmp_path: Path):
     res = perform_logs_search("brainstorm", logs, date="20250101", mode="brainstorm", max_results=10)
     assert len(res) == 1
     assert res[0]["mode"] == "brainstorm"
+
+
+def test_perform_logs_search_invalid_regex_matches_literally(tmp_path: Path):
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    (logs / "20250101.jsonl").write_text('{"mode":"probe","msg":"call f(x"}\n{"mode":"probe","msg":"other"}\n')
+
+    res = perform_logs_search("f(x", logs, date="20250101")
+    assert [r["msg"] for r in res] == ["call f(x"]
+
+
+def test_perform_logs_search_defaults_to_latest_file(tmp_path: Path):
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    (logs / "20250101.jsonl").write_text('{"mode":"probe","msg":"old"}\n')
+    (logs / "20250102.jsonl").write_text('{"mode":"probe","msg":"new"}\n')
+    (logs / "notes.txt").write_text('{"mode":"probe","msg":"ignored"}\n')
+
+    res = perform_logs_search("probe", logs)
+    assert [r["msg"] for r in res] == ["new"]
+    assert perform_logs_search("probe", tmp_path / "missing") == []
+
+
+def test_perform_code_search_caps_total_across_files(tmp_path: Path):
+    root = tmp_path / "proj"
+    root.mkdir()
+    for i in range(5):
+        (root / f"f{i}.txt").write_text("needle\n" * 10)
+
+    hits = perform_code_search("needle", root, max_results=7)
+    assert len(hits) == 7
+
+
+def test_perform_logs_search_mode_filter_tolerates_spacing(tmp_path: Path):
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    (logs / "20250101.jsonl").write_text(
+        '{"mode": "judge", "msg": "spaced"}\n'
+        '{"mode":"brainstorm","msg":"judge mentioned"}\n'
+        'not json judge\n'
+    )
+
+    res = perform_logs_search("judge", logs, date="20250101", mode="judge")
+    assert [r["msg"] for r in res] == ["spaced"]
+
+
+def test_perform_logs_search_non_ascii_and_empty(tmp_path: Path):
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    (logs / "20250101.jsonl").write_text('{"mode":"probe","msg":"CAFÉ au lait"}\n{"mode":"probe","msg":"cafe"}\n', encoding="utf-8")
+    (logs / "20250102.jsonl").write_text("")
+
+    assert [r["msg"] for r in perform_logs_search("café", logs, date="20250101")] == ["CAFÉ au lait"]
+    assert [r["msg"] for r in perform_logs_search("caf.$", logs, date="20250101")] == []
+    assert [r["msg"] for r in perform_logs_search("caf. ", logs, date="20250101")] == ["CAFÉ au lait"]
+    assert perform_logs_search("probe", logs, date="20250102") == []
+
+
+def test_perform_logs_search_mode_index_follows_appends(tmp_path: Path):
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    f = logs / "20250101.jsonl"
+    f.write_text('{"mode":"judge","msg":"one"}\n{"mode":"probe","msg":"two"}\n')
+    assert [r["msg"] for r in perform_logs_search("", logs, date="20250101", mode="judge")] == ["one"]
+
+    with f.open("a") as fh:
+        fh.write('{"mode":"judge","msg":"three"}\n{"mode":"judge","msg":"partial"}')
+    res = perform_logs_search("", logs, date="20250101", mode="judge")
+    assert [r["msg"] for r in res] == ["one", "three", "partial"]
+
+
+def test_perform_logs_search_scan_all(tmp_path: Path):
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    (logs / "20250101.jsonl").write_text('{"mode":"probe","msg":"old"}\n')
+    (logs / "20250102.jsonl").write_text('{"mode":"probe","msg":"new"}\n')
+
+    assert [r["msg"] for r in perform_logs_search("probe", logs)] == ["new"]
+    assert [r["msg"] for r in perform_logs_search("probe", logs, scan_all=True)] == ["old", "new"]
+    assert [r["msg"] for r in perform_logs_search("probe", logs, scan_all=True, max_results=1)] == ["old"]
+
+
+def test_perform_logs_search_whole_buffer_scan(tmp_path: Path):
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    (logs / "20250101.jsonl").write_text(
+        '{"msg":"hay"}\n{"msg":"needle one"}\n\n{"msg":"hay"}\n{"msg":"NEEDLE two"}'
+    )
+
+    assert [r["msg"] for r in perform_logs_search("needle", logs)] == ["needle one", "NEEDLE two"]
+    assert len(perform_logs_search("", logs)) == 4
+    # A match that only exists across a line break must not count.
+    assert perform_logs_search(r'hay"\}\s+\{"msg', logs) == []
+
+
+def test_perform_logs_search_newest_first(tmp_path: Path):
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    (logs / "20250101.jsonl").write_text('{"mode":"probe","msg":"a"}\n')
+    (logs / "20250102.jsonl").write_text(
+        '{"mode":"probe","msg":"b"}\n{"mode":"judge","msg":"c"}\n\n{"mode":"probe","msg":"d"}\n{"mode":"probe","msg":"e"}'
+    )
+
+    assert [r["msg"] for r in perform_logs_search("", logs, newest_first=True)] == ["e", "d", "c", "b"]
+    assert [r["msg"] for r in perform_logs_search("", logs, mode="probe", newest_first=True, max_results=2)] == ["e", "d"]
+    assert [r["msg"] for r in perform_logs_search("probe", logs, scan_all=True, newest_first=True)] == ["e", "d", "b", "a"]
+
+
+def test_perform_logs_search_mode_index_per_file_lock(tmp_path: Path):
+    import threading
+    import server.search as search
+
+    a, b = tmp_path / "a", tmp_path / "b"
+    a.mkdir()
+    b.mkdir()
+    (a / "20250101.jsonl").write_text('{"mode":"judge","msg":"a"}\n')
+    (b / "20250101.jsonl").write_text('{"mode":"judge","msg":"b"}\n')
+    assert [r["msg"] for r in perform_logs_search("", a, mode="judge")] == ["a"]
+
+    # While one file's index is being built, other files stay searchable.
+    with search._MODE_INDEXES[str(a / "20250101.jsonl")].lock:
+        t = threading.Thread(target=perform_logs_search, args=("", b), kwargs={"mode": "judge"})
+        t.start()
+        t.join(timeout=5)
+        assert not t.is_alive()
+
+
+def test_perform_logs_search_mode_index_rebuilds_after_truncation(tmp_path: Path):
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    f = logs / "20250101.jsonl"
+    f.write_text('{"mode":"judge","msg":"one"}\n{"mode":"probe","msg":"two"}\n')
+    assert [r["msg"] for r in perform_logs_search("", logs, mode="judge")] == ["one"]
+
+    # copytruncate-style rotation: same inode, regrown past the old size.
+    with f.open("r+") as fh:
+        fh.truncate(0)
+        fh.write('{"mode":"probe","msg":"three, a longer line"}\n{"mode":"judge","msg":"four"}\n'
+                 '{"mode":"judge","msg":"five"}\n')
+    assert [r["msg"] for r in perform_logs_search("", logs, mode="judge")] == ["four", "five"]
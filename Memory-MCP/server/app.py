@@ -1,5 +1,8 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
+import hashlib
+import hmac
 import json
 import os
 from pathlib import Path
@@ -7,7 +10,7 @@ from typing import Optional, List, Dict, Any
 
 try:
     from fastapi import FastAPI, Request
-    from fastapi.responses import JSONResponse, StreamingResponse, HTMLResponse
+    from fastapi.responses import JSONResponse, StreamingResponse, HTMLResponse, Response
     from pydantic import BaseModel
     import uvicorn
     import logging
@@ -16,7 +19,13 @@ except Exception:
     print("Create a venv and: pip install fastapi uvicorn")
     raise SystemExit(1)
 
-from .storage import init_db, write_memory, read_memory, search_memory, list_memories
+try:
+    # Optional: C-accelerated JSON encoding for hot response paths.
+    import orjson
+except Exception:
+    orjson = None
+
+from .storage import ConnectionPool, WriteBatcher, audit_write, write_memory, read_memory, search_memory, iter_search_memory, list_memories
 
 
 # ----- Pydantic models for better OpenAPI docs -----
@@ -75,19 +84,103 @@ class ListMemoriesResponse(BaseModel):
     items: List[MemoryEntryModel]
 
 
-def _auth_ok(request: Request) -> bool:
-    token = os.environ.get('MEM_TOKEN')
+def _dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            # e.g. integers in user metadata wider than 64 bits
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed."""
+
+    def render(self, content: Any) -> bytes:
+        return _dumps(content)
+
+
+class _EncodedResult:
+    """A JSON-RPC result that is already encoded; see _encode_message."""
+
+    __slots__ = ('data',)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+
+def _load_token() -> bytes:
+    return (os.environ.get('MEM_TOKEN') or '').strip().encode('utf-8')
+
+
+def _token_ok(request: Request, token: bytes) -> bool:
     if not token:
         return True
     hdr = request.headers.get('Authorization')
     if not hdr or not hdr.startswith('Bearer '):
         return False
-    return hdr.split(' ', 1)[1].strip() == token.strip()
+    return hmac.compare_digest(hdr[7:].strip().encode('utf-8'), token)
+
+
+def _static_page(html: str):
+    """Return a request handler serving `html` from a prebuilt response, 304 on a matching ETag."""
+    body = html.encode('utf-8')
+    etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+    headers = {'Cache-Control': 'public, max-age=3600', 'ETag': etag}
+    page = HTMLResponse(content=body, headers=headers)
+    not_modified = Response(status_code=304, headers=headers)
+
+    def serve(request: Request) -> Response:
+        if etag in request.headers.get('If-None-Match', ''):
+            return not_modified
+        return page
+    return serve
 
 
 def create_app(home: Path) -> FastAPI:
     app = FastAPI()
-    con = init_db(home)
+    pool = ConnectionPool(home)
+    writes = WriteBatcher(pool)
+    # Read MEM_TOKEN once; requests only pay a constant-time compare.
+    token = _load_token()
+
+    def _auth_ok(request: Request) -> bool:
+        return _token_ok(request, token)
+
+    # sqlite3 blocks, so queries run in worker threads on pooled connections
+    # instead of stalling the event loop for every other request.
+    # `batch` is the writer connection of an open batch transaction (see mcp_post).
+    async def db_read(fn, batch=None, **kwargs):
+        if batch is not None:
+            return await asyncio.to_thread(fn, batch, **kwargs)
+
+        def call():
+            with pool.reader() as con:
+                return fn(con, **kwargs)
+        return await asyncio.to_thread(call)
+
+    async def db_write(batch=None, **kwargs):
+        if batch is not None:
+            return await asyncio.to_thread(write_memory, batch, home, auto_commit=False, **kwargs)
+
+        # Concurrent single writes are group-committed by `writes`.
+        entry = await asyncio.wrap_future(writes.submit(**kwargs))
+        pool.reads.put(entry, latest=True)
+        return entry
+
+    # Repeat reads of an id or of the latest (project, key) are served from
+    # pool.reads. A batch's reads bypass it: they must see its uncommitted writes.
+    async def db_read_entry(batch=None, **kwargs):
+        if batch is None:
+            entry = pool.reads.get(**kwargs)
+            if entry is not None:
+                return entry
+        entry = await db_read(read_memory, batch, **kwargs)
+        if entry is not None and batch is None:
+            pool.reads.put(entry, latest=not kwargs.get('id'))
+        return entry
+
     # Basic logging (stdout). Control with MEM_LOG_LEVEL (e.g., DEBUG, INFO, WARNING).
     lvl = os.environ.get('MEM_LOG_LEVEL', 'INFO').upper()
     logging.basicConfig(level=getattr(logging, lvl, logging.INFO), format='[%(levelname)s] %(message)s')
@@ -211,7 +304,7 @@ def create_app(home: Path) -> FastAPI:
                 'outputSchema': {
                     'type': 'object',
                     'properties': {
-                        'items': {'type': 'array', 'items': _memory_entry_schema(), 'description': 'Matching entries.'}
+                        'items': {'type': 'array', 'items': entry_schema, 'description': 'Matching entries.'}
                     },
                     'required': ['items']
                 }
@@ -232,13 +325,16 @@ def create_app(home: Path) -> FastAPI:
                 'outputSchema': {
                     'type': 'object',
                     'properties': {
-                        'items': {'type': 'array', 'items': _memory_entry_schema(), 'description': 'Recent entries.'}
+                        'items': {'type': 'array', 'items': entry_schema, 'description': 'Recent entries.'}
                     },
                     'required': ['items']
                 }
             },
         ]
 
+    # The tool schemas are static: build them once, not on every tools/list.
+    tools = mcp_tools()
+
     @app.get('/healthz')
     def healthz():
         return {'ok': True, 'home': str(home)}
@@ -247,9 +343,7 @@ def create_app(home: Path) -> FastAPI:
     async def http_write_memory(request: Request, body: WriteMemoryRequest):
         if not _auth_ok(request):
             return JSONResponse({'error': 'unauthorized'}, status_code=401)
-        entry = write_memory(
-            con,
-            home,
+        entry = await db_write(
             project=body.project,
             scope=body.scope or 'project',
             key=body.key,
@@ -258,28 +352,28 @@ def create_app(home: Path) -> FastAPI:
             ttl_sec=body.ttlSec,
             metadata=body.metadata,
         )
-        return JSONResponse(entry.__dict__)
+        return ORJSONResponse(entry.__dict__)
 
     @app.post('/actions/read_memory', response_model=ReadMemoryResponse)
     async def http_read_memory(request: Request, body: ReadMemoryRequest):
         if not _auth_ok(request):
             return JSONResponse({'error': 'unauthorized'}, status_code=401)
-        entry = read_memory(con, id=body.id, project=body.project, key=body.key)
-        return JSONResponse({'entry': entry.__dict__ if entry else None})
+        entry = await db_read_entry(id=body.id, project=body.project, key=body.key)
+        return ORJSONResponse({'entry': entry.__dict__ if entry else None})
 
     @app.post('/actions/search_memory', response_model=SearchMemoryResponse)
     async def http_search_memory(request: Request, body: SearchMemoryRequest):
         if not _auth_ok(request):
             return JSONResponse({'error': 'unauthorized'}, status_code=401)
-        items = search_memory(con, query=body.query or '', project=body.project, tags=body.tags or [], k=int(body.k or 20))
-        return JSONResponse({'items': [e.__dict__ for e in items]})
+        items = await db_read(search_memory, query=body.query or '', project=body.project, tags=body.tags or [], k=int(body.k or 20))
+        return ORJSONResponse({'items': [e.__dict__ for e in items]})
 
     @app.post('/actions/list_memories', response_model=ListMemoriesResponse)
     async def http_list_memories(request: Request, body: ListMemoriesRequest):
         if not _auth_ok(request):
             return JSONResponse({'error': 'unauthorized'}, status_code=401)
-        items = list_memories(con, project=body.project, tags=body.tags or [], limit=int(body.limit), offset=int(body.offset))
-        return JSONResponse({'items': [e.__dict__ for e in items]})
+        items = await db_read(list_memories, project=body.project, tags=body.tags or [], limit=int(body.limit), offset=int(body.offset))
+        return ORJSONResponse({'items': [e.__dict__ for e in items]})
 
     @app.get('/sse/stream_search_memory')
     async def http_stream_search_memory(request: Request, query: str, project: Optional[str] = None, k: int = 50, durationSec: int = 15):
@@ -292,20 +386,27 @@ def create_app(home: Path) -> FastAPI:
                 start = time.time()
                 sent = 0
                 last_ping = 0.0
-                items = search_memory(con, query=query, project=project, tags=None, k=k)
-                for e in items:
-                    now = time.time()
-                    if now - last_ping > 5.0:
-                        yield "event: ping\n" + f"data: {{\"t\": {int(now)} }}\n\n"
-                        last_ping = now
-                    if now - start > durationSec:
-                        break
-                    yield f"event: message\n" + f"data: {json.dumps(e.__dict__, ensure_ascii=False)}\n\n"
-                    sent += 1
-                yield f"event: end\n" + f"data: {json.dumps({'count': sent})}\n\n"
+                # Stream rows straight off the cursor: the first events go out
+                # before SQLite has produced all k hits. Starlette drives this
+                # generator from its threadpool, so the reads stay off the loop.
+                # The client sets the pace, so use a connection of our own
+                # rather than pinning one of the pool's readers.
+                with pool.dedicated() as con:
+                    for e in iter_search_memory(con, query=query, project=project, tags=None, k=k):
+                        now = time.time()
+                        if now - last_ping > 5.0:
+                            yield b'event: ping\ndata: {"t": %d }\n\n' % int(now)
+                            last_ping = now
+                        if now - start > durationSec:
+                            break
+                        yield b'event: message\ndata: ' + _dumps(e.__dict__) + b'\n\n'
+                        sent += 1
+                yield b'event: end\ndata: ' + _dumps({'count': sent}) + b'\n\n'
             except Exception as e:
-                yield f"event: error\n" + f"data: {json.dumps({'error': str(e)})}\n\n"
-        return StreamingResponse(gen(), media_type='text/event-stream')
+                yield b'event: error\ndata: ' + _dumps({'error': str(e)}) + b'\n\n'
+        # Frames are bytes, written as-is; tell proxies not to buffer the stream.
+        headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        return StreamingResponse(gen(), media_type='text/event-stream', headers=headers)
 
     # ---- Minimal MCP Streamable HTTP endpoint ----
     @app.get('/mcp')
@@ -348,13 +449,20 @@ def create_app(home: Path) -> FastAPI:
                 obj = _normalize_entry_dict(obj)
         return obj
 
-    def _text_and_structured(obj: Any):
-        norm = _normalize_structured(obj)
-        return {
-            'content': [{'type': 'text', 'text': json.dumps(norm, ensure_ascii=False)}],
-            'structuredContent': norm,
-            'isError': False,
-        }
+    def _text_and_structured(obj: Any) -> '_EncodedResult':
+        # The text content and structuredContent carry the same JSON, so encode
+        # the object once and splice those bytes into both places.
+        payload = _dumps(_normalize_structured(obj))
+        return _EncodedResult(b''.join((
+            b'{"content":[{"type":"text","text":', _dumps(payload.decode()),
+            b'}],"structuredContent":', payload, b',"isError":false}',
+        )))
+
+    def _encode_message(msg: Dict[str, Any]) -> bytes:
+        result = msg.get('result')
+        if isinstance(result, _EncodedResult):
+            return b''.join((b'{"jsonrpc":"2.0","id":', _dumps(msg.get('id')), b',"result":', result.data, b'}'))
+        return _dumps(msg)
 
     @app.post('/mcp')
     async def mcp_post(request: Request):
@@ -364,7 +472,10 @@ def create_app(home: Path) -> FastAPI:
         except Exception:
             return JSONResponse({'error': 'invalid json'}, status_code=400)
 
-        async def handle_one(msg):
+        # Writes made inside a batch transaction; cached and audited once it commits.
+        batch_written: List[Any] = []
+
+        async def handle_one(msg, batch=None):
             method = msg.get('method')
             msg_id = msg.get('id')
             params = msg.get('params') or {}
@@ -396,7 +507,7 @@ def create_app(home: Path) -> FastAPI:
             if method == 'tools/list':
                 # Omit nextCursor when there is no pagination token to avoid clients
                 # rejecting `null` (some validate as string if present).
-                return _mcp_response(msg_id, result={'tools': mcp_tools()})
+                return _mcp_response(msg_id, result={'tools': tools})
 
             if method == 'tools/call':
                 name = (params or {}).get('name')
@@ -404,9 +515,8 @@ def create_app(home: Path) -> FastAPI:
                 try:
                     LOG.debug("tools/call name=%s args=%s", name, {k: (v if k != 'text' else '…') for k, v in (arguments or {}).items()})
                     if name == 'write_memory':
-                        entry = write_memory(
-                            con,
-                            home,
+                        entry = await db_write(
+                            batch,
                             project=arguments.get('project'),
                             scope=(arguments.get('scope') or 'project'),
                             key=arguments.get('key'),
@@ -415,18 +525,21 @@ def create_app(home: Path) -> FastAPI:
                             ttl_sec=arguments.get('ttlSec'),
                             metadata=arguments.get('metadata'),
                         )
+                        if batch is not None:
+                            batch_written.append(entry)
                         return _mcp_response(msg_id, result=_text_and_structured({'entry': entry.__dict__}))
                     elif name == 'read_memory':
-                        entry = read_memory(
-                            con,
+                        entry = await db_read_entry(
+                            batch,
                             id=arguments.get('id'),
                             project=arguments.get('project'),
                             key=arguments.get('key'),
                         )
                         return _mcp_response(msg_id, result=_text_and_structured({'entry': entry.__dict__ if entry else None}))
                     elif name == 'search_memory':
-                        items = search_memory(
-                            con,
+                        items = await db_read(
+                            search_memory,
+                            batch,
                             query=arguments.get('query') or '',
                             project=arguments.get('project'),
                             tags=arguments.get('tags') or [],
@@ -434,8 +547,9 @@ def create_app(home: Path) -> FastAPI:
                         )
                         return _mcp_response(msg_id, result=_text_and_structured({'items': [e.__dict__ for e in items]}))
                     elif name == 'list_memories':
-                        items = list_memories(
-                            con,
+                        items = await db_read(
+                            list_memories,
+                            batch,
                             project=arguments.get('project'),
                             tags=arguments.get('tags') or [],
                             limit=int(arguments.get('limit') or 50),
@@ -465,25 +579,40 @@ def create_app(home: Path) -> FastAPI:
         # Process single or batch
         if isinstance(body, list):
             out = []
-            for m in body:
-                resp = await handle_one(m)
-                if resp is not None:
-                    out.append(resp)
+            # Several writes in one batch share a single transaction (one commit
+            # instead of one per write); the batch's reads go through the same
+            # connection so they see those writes.
+            n_writes = sum(1 for m in body if isinstance(m, dict) and m.get('method') == 'tools/call'
+                           and ((m.get('params') or {}).get('name') == 'write_memory'))
+            batch = await asyncio.to_thread(pool.begin) if n_writes > 1 else None
+            ok = False
+            try:
+                for m in body:
+                    resp = await handle_one(m, batch)
+                    if resp is not None:
+                        out.append(resp)
+                ok = True
+            finally:
+                if batch is not None:
+                    await asyncio.to_thread(pool.end, ok)
+            # Only reached once the batch committed; a rolled-back batch raised
+            # above and leaves both the cache and the audit log untouched.
+            for entry in batch_written:
+                pool.reads.put(entry, latest=True)
+                audit_write(home, entry)
             # If all were notifications, return 202 with no body
             if not out:
                 return JSONResponse(status_code=202, content=None)
-            return JSONResponse(out)
+            return Response(b'[' + b','.join(_encode_message(m) for m in out) + b']', media_type='application/json')
         elif isinstance(body, dict):
             resp = await handle_one(body)
             if resp is None:
                 return JSONResponse(status_code=202, content=None)
-            return JSONResponse(resp)
+            return Response(_encode_message(resp), media_type='application/json')
         else:
             return JSONResponse({'error': 'invalid payload'}, status_code=400)
 
-    @app.get('/mem')
-    async def mem_ui():
-        html = '''
+    mem_html = '''
         <!DOCTYPE html>
         <html>
         <head>
@@ -549,11 +678,7 @@ def create_app(home: Path) -> FastAPI:
         </body>
         </html>
         '''
-        return HTMLResponse(content=html)
-
-    @app.get('/mcp_ui')
-    async def mcp_ui():
-        html = '''
+    mcp_ui_html = '''
         <!DOCTYPE html>
         <html>
         <head>
@@ -629,7 +754,18 @@ def create_app(home: Path) -> FastAPI:
         </body>
         </html>
         '''
-        return HTMLResponse(content=html)
+    # The UI pages never change while the server runs: encode each once and
+    # let browsers revalidate with If-None-Match.
+    serve_mem = _static_page(mem_html)
+    serve_mcp_ui = _static_page(mcp_ui_html)
+
+    @app.get('/mem')
+    async def mem_ui(request: Request):
+        return serve_mem(request)
+
+    @app.get('/mcp_ui')
+    async def mcp_ui(request: Request):
+        return serve_mcp_ui(request)
 
     return app
 
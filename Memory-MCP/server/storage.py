@@ -1,11 +1,25 @@
 #!/usr/bin/env python3
+import atexit
 import json
+import logging
+import os
+import queue
+import re
 import sqlite3
+import threading
+import time
 import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
 from dataclasses import dataclass
+from functools import lru_cache
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import List, Optional, Tuple, Dict, Any
+from typing import List, Optional, Tuple, Dict, Any, Iterator
+
+
+LOG = logging.getLogger('memory-mcp')
 
 
 @dataclass
@@ -22,11 +36,106 @@ class MemoryEntry:
     metadata: Optional[Dict[str, Any]]
 
 
+class AuditLog:
+    """Append-only JSONL audit file written by a background thread.
+
+    Records queued while a write is in flight go out together in one
+    os.write() on a descriptor kept open with O_APPEND.
+    """
+
+    _BATCH = 256
+
+    def __init__(self, path: Path):
+        self._fd = os.open(str(path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._queue: "queue.Queue[Optional[bytes]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='memory-audit', daemon=True)
+        self._thread.start()
+
+    def append(self, record: Dict[str, Any]) -> None:
+        self._queue.put((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+
+    def flush(self) -> None:
+        """Block until every queued record has been written."""
+        self._queue.join()
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+        os.close(self._fd)
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self._BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            data = b''.join(b for b in batch if b is not None)
+            try:
+                self._write_all(data)
+            except OSError as e:
+                # Drop this batch but keep draining: a dead writer thread would
+                # leave flush() waiting forever.
+                LOG.error("audit log write failed, %d record(s) lost: %s", len(data.splitlines()), e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if None in batch:
+                return
+
+    def _write_all(self, data: bytes) -> None:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view):]
+
+
+_AUDIT_LOGS: Dict[Path, AuditLog] = {}
+_AUDIT_LOCK = threading.Lock()
+
+
+def audit_log(home: Path) -> AuditLog:
+    """The shared AuditLog for `home`/audit.jsonl, opened on first use."""
+    path = home / 'audit.jsonl'
+    with _AUDIT_LOCK:
+        log = _AUDIT_LOGS.get(path)
+        if log is None:
+            log = _AUDIT_LOGS[path] = AuditLog(path)
+        return log
+
+
+@atexit.register
+def _close_audit_logs() -> None:
+    with _AUDIT_LOCK:
+        for log in _AUDIT_LOGS.values():
+            log.close()
+        _AUDIT_LOGS.clear()
+
+
+def _connect(home: Path) -> sqlite3.Connection:
+    # Statement texts come from a few fixed templates (_search_sql/_list_sql);
+    # a larger cache keeps every variant prepared.
+    con = sqlite3.connect(str(home / 'memory.sqlite'), check_same_thread=False, cached_statements=256)
+    con.row_factory = sqlite3.Row
+    # Per-connection tuning: under WAL, synchronous=NORMAL is still crash-safe
+    # (a power loss can drop only the last commits) and skips the fsync per
+    # commit; a bigger page cache, in-memory temp tables and mmap'd reads suit
+    # the read-heavy workload.
+    con.executescript(
+        """
+        PRAGMA synchronous=NORMAL;
+        PRAGMA cache_size=-65536;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA mmap_size=268435456;
+        PRAGMA wal_autocheckpoint=1000;
+        """
+    )
+    return con
+
+
 def init_db(home: Path) -> sqlite3.Connection:
     home.mkdir(parents=True, exist_ok=True)
-    db = home / 'memory.sqlite'
-    con = sqlite3.connect(str(db), check_same_thread=False)
-    con.row_factory = sqlite3.Row
+    con = _connect(home)
     cur = con.cursor()
     cur.execute("PRAGMA journal_mode=WAL;")
     cur.executescript(
@@ -47,12 +156,284 @@ def init_db(home: Path) -> sqlite3.Connection:
         CREATE VIRTUAL TABLE IF NOT EXISTS fts_memories USING fts5(
           text, tags, project, key, scope, content='memories', content_rowid='rowid'
         );
+        -- keep the external-content FTS index in step with memories
+        CREATE TRIGGER IF NOT EXISTS memories_ai AFTER INSERT ON memories BEGIN
+          INSERT INTO fts_memories(rowid, text, tags, project, key, scope)
+          VALUES (new.rowid, new.text, new.tags, new.project, new.key, new.scope);
+        END;
+        CREATE TRIGGER IF NOT EXISTS memories_ad AFTER DELETE ON memories BEGIN
+          INSERT INTO fts_memories(fts_memories, rowid, text, tags, project, key, scope)
+          VALUES ('delete', old.rowid, old.text, old.tags, old.project, old.key, old.scope);
+        END;
+        CREATE TRIGGER IF NOT EXISTS memories_au AFTER UPDATE ON memories BEGIN
+          INSERT INTO fts_memories(fts_memories, rowid, text, tags, project, key, scope)
+          VALUES ('delete', old.rowid, old.text, old.tags, old.project, old.key, old.scope);
+          INSERT INTO fts_memories(rowid, text, tags, project, key, scope)
+          VALUES (new.rowid, new.text, new.tags, new.project, new.key, new.scope);
+        END;
+        -- one row per (memory, tag) so tag filters are index lookups, not LIKE scans
+        CREATE TABLE IF NOT EXISTS memory_tags(
+          memory_rowid INTEGER NOT NULL,
+          tag TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_memory_tags_tag ON memory_tags(tag, memory_rowid);
+        -- latest-version lookups (write_memory, read_memory) and list_memories' ordering
+        CREATE INDEX IF NOT EXISTS idx_mem_project_key_version ON memories(project, key, version DESC);
+        CREATE INDEX IF NOT EXISTS idx_mem_created_at ON memories(created_at DESC);
         """
     )
+    # Databases created before memory_tags existed: fill it once from memories.tags.
+    if cur.execute("PRAGMA user_version").fetchone()[0] < 1:
+        rows = cur.execute("SELECT rowid, tags FROM memories WHERE tags IS NOT NULL AND tags != ''").fetchall()
+        cur.executemany(
+            "INSERT INTO memory_tags(memory_rowid, tag) VALUES (?, ?)",
+            [(r[0], t) for r in rows for t in set(r[1].split(','))],
+        )
+        cur.execute("PRAGMA user_version = 1")
     con.commit()
     return con
 
 
+class ReadCache:
+    """Bounded LRU of entries read by id and by latest (project, key).
+
+    An id always names the same immutable row, so those entries only age out
+    by size; the latest-version lookups also expire after `ttl` seconds, which
+    bounds staleness when another process writes to the same database.
+    """
+
+    def __init__(self, size: int = 4096, ttl: float = 30.0):
+        self._size = size
+        self._ttl = ttl
+        self._by_id: 'OrderedDict[str, MemoryEntry]' = OrderedDict()
+        self._latest: 'OrderedDict[Tuple[Any, Any], Tuple[float, MemoryEntry]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, *, id: Optional[str] = None, project: Optional[str] = None, key: Optional[str] = None) -> Optional[MemoryEntry]:
+        with self._lock:
+            if id:
+                entry = self._by_id.get(id)
+                if entry is not None:
+                    self._by_id.move_to_end(id)
+                return entry
+            if project is None or key is None:
+                return None
+            hit = self._latest.get((project, key))
+            if hit is None:
+                return None
+            if time.monotonic() - hit[0] >= self._ttl:
+                del self._latest[(project, key)]
+                return None
+            self._latest.move_to_end((project, key))
+            return hit[1]
+
+    def put(self, entry: MemoryEntry, latest: bool = False) -> None:
+        """Remember `entry` by id and, when it is the newest version, by (project, key)."""
+        with self._lock:
+            self._by_id[entry.id] = entry
+            self._by_id.move_to_end(entry.id)
+            if len(self._by_id) > self._size:
+                self._by_id.popitem(last=False)
+            if not latest or entry.project is None or entry.key is None:
+                return
+            pk = (entry.project, entry.key)
+            old = self._latest.get(pk)
+            # Racing writers may report out of order; never step back a version.
+            if old is not None and old[1].version > entry.version:
+                return
+            self._latest[pk] = (time.monotonic(), entry)
+            self._latest.move_to_end(pk)
+            if len(self._latest) > self._size:
+                self._latest.popitem(last=False)
+
+
+class ConnectionPool:
+    """One writer connection plus up to `readers` reader connections for a home.
+
+    WAL mode lets readers run alongside the writer; writes take the writer's
+    lock so a version bump (SELECT MAX then INSERT) cannot interleave.
+    """
+
+    def __init__(self, home: Path, readers: int = 4):
+        self.home = home
+        self._writer = init_db(home)
+        self._write_lock = threading.Lock()
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._max_readers = max(1, readers)
+        self._opened = 0
+        self._open_lock = threading.Lock()
+        self.reads = ReadCache()
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        with self._write_lock:
+            yield self._writer
+
+    def begin(self) -> sqlite3.Connection:
+        """Take the writer for one multi-statement transaction; pair with end()."""
+        self._write_lock.acquire()
+        try:
+            self._writer.execute('BEGIN IMMEDIATE')
+        except Exception:
+            self._write_lock.release()
+            raise
+        return self._writer
+
+    def end(self, commit: bool = True) -> None:
+        try:
+            if commit:
+                self._writer.commit()
+            else:
+                self._writer.rollback()
+        finally:
+            self._write_lock.release()
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        try:
+            con = self._idle.get_nowait()
+        except queue.Empty:
+            with self._open_lock:
+                grow = self._opened < self._max_readers
+                if grow:
+                    self._opened += 1
+            con = _connect(self.home) if grow else self._idle.get()
+        try:
+            yield con
+        finally:
+            self._idle.put(con)
+
+    @contextmanager
+    def dedicated(self) -> Iterator[sqlite3.Connection]:
+        """A connection outside the pool, for readers that hold it across yields.
+
+        A streaming response can stay open for as long as the client keeps
+        reading; holding a pooled reader that long would starve other reads.
+        """
+        con = _connect(self.home)
+        try:
+            yield con
+        finally:
+            con.close()
+
+
+class WriteBatcher:
+    """Group commit for single writes.
+
+    One background thread takes every write queued since its last commit (up
+    to _BATCH), runs them in one transaction and commits once. Nothing waits
+    on a timer: a lone write commits at once, and under load the writes that
+    arrive during a commit share the next one. Each write runs inside its own
+    SAVEPOINT, so a failing write is undone without failing its neighbours.
+    """
+
+    _BATCH = 32
+
+    def __init__(self, pool: 'ConnectionPool'):
+        self._pool = pool
+        self._queue: "queue.SimpleQueue[Optional[Tuple[Dict[str, Any], Future]]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name='memory-writes', daemon=True)
+        self._thread.start()
+
+    def submit(self, **kwargs: Any) -> 'Future[MemoryEntry]':
+        """Queue write_memory(**kwargs); the future resolves once it is committed."""
+        fut: 'Future[MemoryEntry]' = Future()
+        self._queue.put((kwargs, fut))
+        return fut
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self._BATCH and batch[-1] is not None:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            items = [b for b in batch if b is not None]
+            if items:
+                self._commit(items)
+            if batch[-1] is None:
+                return
+
+    def _commit(self, items: List[Tuple[Dict[str, Any], Future]]) -> None:
+        try:
+            con = self._pool.begin()
+        except Exception as e:
+            for _, fut in items:
+                fut.set_exception(e)
+            return
+        written: Dict[Future, MemoryEntry] = {}
+        error: Optional[Exception] = None
+        try:
+            for kwargs, fut in items:
+                con.execute('SAVEPOINT write')
+                try:
+                    written[fut] = write_memory(con, self._pool.home, auto_commit=False, **kwargs)
+                except Exception as e:
+                    con.execute('ROLLBACK TO write')
+                    fut.set_exception(e)
+                con.execute('RELEASE write')
+        except Exception as e:
+            error = e
+        try:
+            self._pool.end(commit=error is None)
+        except Exception as e:
+            error = error or e
+        for _, fut in items:
+            if fut.done():
+                continue
+            if error is None:
+                # Audit only what the group commit actually persisted.
+                audit_write(self._pool.home, written[fut])
+                fut.set_result(written[fut])
+            else:
+                fut.set_exception(error)
+
+
+def _tags_clause(column: str, n_tags: int) -> str:
+    """SQL restricting `column` (a memories rowid) to entries carrying every one
+    of `n_tags` tags; takes the tags then their count as parameters."""
+    marks = ','.join('?' * n_tags)
+    return (f"{column} IN (SELECT memory_rowid FROM memory_tags WHERE tag IN ({marks}) "
+            "GROUP BY memory_rowid HAVING COUNT(DISTINCT tag) = ?)")
+
+
+def _tag_args(tags: Optional[List[str]]) -> List[Any]:
+    """Parameters for _tags_clause: the distinct tags, then how many there are."""
+    # MCP arguments are unvalidated JSON: compare tags as strings, as stored.
+    wanted: List[Any] = sorted({str(t) for t in tags or []})
+    return wanted + [len(wanted)] if wanted else []
+
+
+@lru_cache(maxsize=64)
+def _search_sql(has_project: bool, n_tags: int) -> str:
+    """Parameters: match query, [project], [tags..., tag count], limit."""
+    sql = "SELECT m.* FROM fts_memories f JOIN memories m ON f.rowid = m.rowid WHERE f.text MATCH ?"
+    if has_project:
+        sql += " AND m.project IS ?"
+    if n_tags:
+        sql += " AND " + _tags_clause("m.rowid", n_tags)
+    return sql + " LIMIT ?"
+
+
+@lru_cache(maxsize=64)
+def _list_sql(has_project: bool, n_tags: int) -> str:
+    """Parameters: [project], [tags..., tag count], limit, offset."""
+    clauses = []
+    if has_project:
+        clauses.append("project IS ?")
+    if n_tags:
+        clauses.append(_tags_clause("rowid", n_tags))
+    sql = "SELECT * FROM memories"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    return sql + " ORDER BY created_at DESC LIMIT ? OFFSET ?"
+
+
 def _to_entry(row: sqlite3.Row) -> MemoryEntry:
     tags = (row['tags'] or '').split(',') if row['tags'] else []
     md = None
@@ -75,7 +456,7 @@ def _to_entry(row: sqlite3.Row) -> MemoryEntry:
     )
 
 
-def write_memory(con: sqlite3.Connection, home: Path, *, project: Optional[str], scope: str, key: Optional[str], text: str, tags: Optional[List[str]] = None, ttl_sec: Optional[int] = None, metadata: Optional[Dict[str, Any]] = None) -> MemoryEntry:
+def write_memory(con: sqlite3.Connection, home: Path, *, project: Optional[str], scope: str, key: Optional[str], text: str, tags: Optional[List[str]] = None, ttl_sec: Optional[int] = None, metadata: Optional[Dict[str, Any]] = None, auto_commit: bool = True) -> MemoryEntry:
     cur = con.cursor()
     # versioning: if project+key present, increment; else start at 1
     version = 1
@@ -88,37 +469,56 @@ def write_memory(con: sqlite3.Connection, home: Path, *, project: Optional[str],
     mid = str(uuid.uuid4())
     # RFC3339 compliant timestamp with timezone
     now = datetime.now(timezone.utc).isoformat()
-    tags_str = ','.join(tags) if tags else ''
+    tags = [str(t) for t in tags] if tags else []
+    tags_str = ','.join(tags)
     md_json = json.dumps(metadata) if metadata else None
 
     cur.execute(
         "INSERT INTO memories(id, version, project, key, scope, text, tags, created_at, ttl_sec, metadata) VALUES (?,?,?,?,?,?,?,?,?,?)",
         (mid, version, project, key, scope, text, tags_str, now, ttl_sec, md_json),
     )
-    # sync FTS row
-    cur.execute(
-        "INSERT INTO fts_memories(rowid, text, tags, project, key, scope) VALUES (last_insert_rowid(), ?, ?, ?, ?, ?)",
-        (text, tags_str, project, key, scope),
+    rowid = cur.lastrowid
+    # fts_memories is maintained by the memories_ai trigger
+    if tags:
+        cur.executemany(
+            "INSERT INTO memory_tags(memory_rowid, tag) VALUES (?, ?)",
+            [(rowid, t) for t in set(tags)],
+        )
+    # Built from what was just stored, shaped as _to_entry would read it back.
+    entry = MemoryEntry(
+        id=mid,
+        version=version,
+        project=project,
+        key=key,
+        scope=scope,
+        text=text,
+        tags=tags_str.split(',') if tags_str else [],
+        createdAt=now,
+        ttlSec=ttl_sec,
+        metadata=metadata or None,
     )
-    con.commit()
+    if auto_commit:
+        con.commit()
+        audit_write(home, entry)
+    return entry
 
-    # Audit log
-    audit = home / 'audit.jsonl'
-    with audit.open('a', encoding='utf-8') as f:
-        f.write(json.dumps({
-            'ts': now,
-            'action': 'write',
-            'id': mid,
-            'version': version,
-            'project': project,
-            'key': key,
-            'scope': scope,
-            'tags': tags,
-        }, ensure_ascii=False) + '\n')
 
-    cur = con.cursor()
-    cur = con.execute("SELECT * FROM memories WHERE id = ?", (mid,))
-    return _to_entry(cur.fetchone())
+def audit_write(home: Path, entry: MemoryEntry) -> None:
+    """Record a committed write in the audit log (written asynchronously; see AuditLog).
+
+    write_memory(auto_commit=False) leaves this to the caller, to be done only
+    once the enclosing transaction has committed.
+    """
+    audit_log(home).append({
+        'ts': entry.createdAt,
+        'action': 'write',
+        'id': entry.id,
+        'version': entry.version,
+        'project': entry.project,
+        'key': entry.key,
+        'scope': entry.scope,
+        'tags': entry.tags,
+    })
 
 
 def read_memory(con: sqlite3.Connection, *, id: Optional[str] = None, project: Optional[str] = None, key: Optional[str] = None) -> Optional[MemoryEntry]:
@@ -136,41 +536,35 @@ def read_memory(con: sqlite3.Connection, *, id: Optional[str] = None, project: O
     return None
 
 
-def search_memory(con: sqlite3.Connection, *, query: str, project: Optional[str] = None, tags: Optional[List[str]] = None, k: int = 20) -> List[MemoryEntry]:
+_WORD = re.compile(r'\w+')
+
+
+def iter_search_memory(con: sqlite3.Connection, *, query: str, project: Optional[str] = None, tags: Optional[List[str]] = None, k: int = 20, chunk: int = 64) -> Iterator[MemoryEntry]:
+    """Yield search hits as SQLite produces them, `chunk` rows at a time."""
     # Use FTS MATCH; if project/tags filters present, intersect
-    # To avoid parse errors like "no such column: ..." when users pass special tokens,
-    # treat the input as a single phrase by quoting it for FTS5.
-    q = (query or '').replace('"', ' ')
-    q = f'"{q.strip()}"' if q.strip() else '""'
-    sql = "SELECT m.* FROM fts_memories f JOIN memories m ON f.rowid = m.rowid WHERE f.text MATCH ?"
-    args: List[Any] = [q]
-    if project is not None:
-        sql += " AND m.project IS ?"
-        args.append(project)
-    if tags:
-        for t in tags:
-            sql += " AND m.tags LIKE ?"
-            args.append(f"%{t}%")
-    sql += " LIMIT ?"
-    args.append(k)
-    cur = con.execute(sql, args)
-    return [_to_entry(row) for row in cur.fetchall()]
+    # Every word becomes a quoted prefix term ("tok"*), implicitly ANDed, so FTS5
+    # answers from its index and user input can never be parsed as query syntax.
+    q = ' '.join(f'"{t}"*' for t in _WORD.findall(query or '')) or '""'
+    tag_args = _tag_args(tags)
+    args: List[Any] = [q] + ([project] if project is not None else []) + tag_args + [k]
+    cur = con.execute(_search_sql(project is not None, tag_args[-1] if tag_args else 0), args)
+    try:
+        while True:
+            rows = cur.fetchmany(chunk)
+            if not rows:
+                return
+            for row in rows:
+                yield _to_entry(row)
+    finally:
+        cur.close()
+
+
+def search_memory(con: sqlite3.Connection, *, query: str, project: Optional[str] = None, tags: Optional[List[str]] = None, k: int = 20) -> List[MemoryEntry]:
+    return list(iter_search_memory(con, query=query, project=project, tags=tags, k=k, chunk=max(1, k)))
 
 
 def list_memories(con: sqlite3.Connection, *, project: Optional[str] = None, tags: Optional[List[str]] = None, limit: int = 50, offset: int = 0) -> List[MemoryEntry]:
-    sql = "SELECT * FROM memories"
-    clauses = []
-    args: List[Any] = []
-    if project is not None:
-        clauses.append("project IS ?")
-        args.append(project)
-    if tags:
-        for t in tags:
-            clauses.append("tags LIKE ?")
-            args.append(f"%{t}%")
-    if clauses:
-        sql += " WHERE " + " AND ".join(clauses)
-    sql += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
-    args.extend([limit, offset])
-    cur = con.execute(sql, args)
+    tag_args = _tag_args(tags)
+    args: List[Any] = ([project] if project is not None else []) + tag_args + [limit, offset]
+    cur = con.execute(_list_sql(project is not None, tag_args[-1] if tag_args else 0), args)
     return [_to_entry(row) for row in cur.fetchall()]
@@ -13,6 +13,21 @@ def require_fastapi():
         pytest.skip(f"fastapi not available: {e}")
 
 
+def make_client(home: Path):
+    require_fastapi()
+    from fastapi.testclient import TestClient
+    root = Path(__file__).resolve().parents[1]
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+    from server.app import create_app
+    return TestClient(create_app(home))
+
+
+@pytest.fixture
+def client(tmp_path: Path):
+    return make_client(tmp_path / 'memorydb')
+
+
 def test_write_read_search(tmp_path: Path):
     require_fastapi()
     from fastapi.testclient import TestClient
@@ -62,3 +77,225 @@ def test_write_read_search(tmp_path: Path):
     assert r.status_code == 200
     assert len(r.json()['items']) >= 1
 
+    # audit trail
+    from server.storage import audit_log
+    audit_log(home).flush()
+    lines = (home / 'audit.jsonl').read_text().splitlines()
+    assert [json.loads(l)['id'] for l in lines] == [entry['id']]
+
+
+def test_tag_filters_match_whole_tags(client):
+    for text, tags in [('alpha note', ['decision', 'prompt']), ('beta note', ['decisions']), ('gamma note', ['prompt'])]:
+        r = client.post('/actions/write_memory', json={'project': 'P', 'text': text, 'tags': tags})
+        assert r.status_code == 200
+
+    r = client.post('/actions/list_memories', json={'project': 'P', 'tags': ['decision']})
+    assert [e['text'] for e in r.json()['items']] == ['alpha note']
+    r = client.post('/actions/list_memories', json={'project': 'P', 'tags': ['prompt', 'decision']})
+    assert [e['text'] for e in r.json()['items']] == ['alpha note']
+    r = client.post('/actions/search_memory', json={'query': 'note', 'tags': ['prompt'], 'k': 10})
+    assert sorted(e['text'] for e in r.json()['items']) == ['alpha note', 'gamma note']
+
+    # MCP arguments skip schema validation: non-string tags compare as strings.
+    def call(name, arguments):
+        r = client.post('/mcp', json={'jsonrpc': '2.0', 'id': 1, 'method': 'tools/call',
+                                      'params': {'name': name, 'arguments': arguments}})
+        return r.json()['result']
+    assert call('write_memory', {'project': 'P', 'text': 'delta note', 'tags': ['v', 2]})['isError'] is False
+    res = call('list_memories', {'project': 'P', 'tags': ['v', 2]})
+    assert [e['text'] for e in res['structuredContent']['items']] == ['delta note']
+    res = call('list_memories', {'project': 'P', 'tags': ['decision', 1]})
+    assert res['isError'] is False and res['structuredContent']['items'] == []
+
+
+def test_search_matches_words_in_any_order(client):
+    client.post('/actions/write_memory', json={'text': 'Dynamic tokens: max(512, n*120)'})
+
+    def texts(query):
+        r = client.post('/actions/search_memory', json={'query': query})
+        assert r.status_code == 200
+        return [e['text'] for e in r.json()['items']]
+
+    assert texts('tokens dynamic') == ['Dynamic tokens: max(512, n*120)']
+    assert texts('dyn tok') == ['Dynamic tokens: max(512, n*120)']
+    assert texts('max( "n*" NEAR') == []
+    assert texts('max( n*') == ['Dynamic tokens: max(512, n*120)']
+    assert texts('tokens missing') == []
+
+
+def test_mcp_batch_writes_share_a_transaction(client):
+    def call(i, name, arguments):
+        return {'jsonrpc': '2.0', 'id': i, 'method': 'tools/call', 'params': {'name': name, 'arguments': arguments}}
+
+    r = client.post('/mcp', json=[
+        call(1, 'write_memory', {'project': 'P', 'key': 'k', 'text': 'first'}),
+        call(2, 'write_memory', {'project': 'P', 'key': 'k', 'text': 'second'}),
+        call(3, 'read_memory', {'project': 'P', 'key': 'k'}),
+    ])
+    assert r.status_code == 200
+    results = [m['result']['structuredContent']['entry'] for m in r.json()]
+    assert [e['version'] for e in results] == [1, 2, 2]
+    assert results[2]['text'] == 'second'
+
+    r = client.post('/actions/read_memory', json={'project': 'P', 'key': 'k'})
+    assert r.json()['entry']['version'] == 2
+
+
+def test_read_cache_follows_writes(client):
+    def latest():
+        return client.post('/actions/read_memory', json={'project': 'P', 'key': 'k'}).json()['entry']
+
+    first = client.post('/actions/write_memory', json={'project': 'P', 'key': 'k', 'text': 'one'}).json()
+    assert latest()['version'] == 1
+    client.post('/actions/write_memory', json={'project': 'P', 'key': 'k', 'text': 'two'})
+    assert latest()['text'] == 'two'
+
+    def call(i, text):
+        return {'jsonrpc': '2.0', 'id': i, 'method': 'tools/call',
+                'params': {'name': 'write_memory', 'arguments': {'project': 'P', 'key': 'k', 'text': text}}}
+    client.post('/mcp', json=[call(1, 'three'), call(2, 'four')])
+    assert latest()['version'] == 4
+    assert client.post('/actions/read_memory', json={'id': first['id']}).json()['entry']['text'] == 'one'
+
+
+def test_read_racing_a_batch_does_not_roll_back_the_cache(client, monkeypatch):
+    from server.storage import ConnectionPool, read_memory
+
+    def latest():
+        return client.post('/actions/read_memory', json={'project': 'P', 'key': 'k'}).json()['entry']
+
+    def call(i, text):
+        return {'jsonrpc': '2.0', 'id': i, 'method': 'tools/call',
+                'params': {'name': 'write_memory', 'arguments': {'project': 'P', 'key': 'k', 'text': text}}}
+
+    client.post('/actions/write_memory', json={'project': 'P', 'key': 'k', 'text': 'one'})
+    assert latest()['version'] == 1
+
+    end = ConnectionPool.end
+    seen = {}
+
+    def end_with_concurrent_read(self, commit=True):
+        # A reader running alongside the batch sees the pre-batch version...
+        with self.reader() as con:
+            seen['stale'] = read_memory(con, project='P', key='k')
+        seen['pool'] = self
+        end(self, commit)
+    monkeypatch.setattr(ConnectionPool, 'end', end_with_concurrent_read)
+    client.post('/mcp', json=[call(1, 'two'), call(2, 'three')])
+    assert seen['stale'].version == 1
+
+    # ...and only reports back after the batch committed.
+    pool = seen['pool']
+    pool.reads.put(seen['stale'], latest=True)
+
+    def no_reader(self):
+        raise AssertionError('latest version was not cached by the batch')
+    monkeypatch.setattr(ConnectionPool, 'reader', no_reader)
+    entry = latest()
+    assert (entry['version'], entry['text']) == (3, 'three')
+
+
+def test_stream_search_does_not_pin_a_pooled_reader(client, monkeypatch):
+    from server.storage import ConnectionPool
+    for i in range(3):
+        client.post('/actions/write_memory', json={'project': 'P', 'key': f'k{i}', 'text': 'streamed note'})
+
+    def no_reader(self):
+        raise AssertionError('stream took a pooled reader')
+    monkeypatch.setattr(ConnectionPool, 'reader', no_reader)
+    r = client.get('/sse/stream_search_memory', params={'query': 'streamed', 'project': 'P'})
+    events = [l.split(': ', 1)[1] for l in r.text.splitlines() if l.startswith('event: ') and l != 'event: ping']
+    assert events == ['message'] * 3 + ['end']
+
+
+def test_write_batcher_group_commits(tmp_path: Path):
+    root = Path(__file__).resolve().parents[1]
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+    from server.storage import ConnectionPool, WriteBatcher, read_memory
+
+    pool = ConnectionPool(tmp_path / 'memorydb')
+    writes = WriteBatcher(pool)
+    futs = [writes.submit(project='P', scope='project', key='k', text=f't{i}') for i in range(40)]
+    bad = writes.submit(project='P', scope='project', key='k', text='bad', metadata={'x': object()})
+    futs += [writes.submit(project='P', scope='project', key='k', text='last')]
+    assert [f.result().version for f in futs] == list(range(1, 42))
+    with pytest.raises(TypeError):
+        bad.result()
+    writes.close()
+    with pool.reader() as con:
+        assert read_memory(con, project='P', key='k').text == 'last'
+
+
+def test_rolled_back_writes_are_not_audited(tmp_path: Path, monkeypatch):
+    import sqlite3
+    home = tmp_path / 'memorydb'
+    client = make_client(home)
+    from server.storage import ConnectionPool, audit_log
+
+    end = ConnectionPool.end
+
+    def failing_end(self, commit=True):
+        end(self, commit=False)
+        raise sqlite3.OperationalError('disk I/O error')
+    monkeypatch.setattr(ConnectionPool, 'end', failing_end)
+
+    def call(i, text):
+        return {'jsonrpc': '2.0', 'id': i, 'method': 'tools/call',
+                'params': {'name': 'write_memory', 'arguments': {'project': 'P', 'key': 'k', 'text': text}}}
+    # An MCP batch transaction, then a group-committed single write.
+    with pytest.raises(sqlite3.OperationalError):
+        client.post('/mcp', json=[call(1, 'one'), call(2, 'two')])
+    with pytest.raises(sqlite3.OperationalError):
+        client.post('/actions/write_memory', json={'project': 'P', 'key': 'k', 'text': 'three'})
+
+    audit_log(home).flush()
+    assert (home / 'audit.jsonl').read_text() == ''
+
+
+def test_audit_log_survives_write_errors_and_short_writes(tmp_path: Path, monkeypatch):
+    import errno
+    import os
+    import threading
+    root = Path(__file__).resolve().parents[1]
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+    from server.storage import AuditLog
+
+    log = AuditLog(tmp_path / 'audit.jsonl')
+    real_write = os.write
+    calls = []
+
+    def flaky_write(fd, data):
+        if fd != log._fd:
+            return real_write(fd, data)
+        calls.append(fd)
+        if len(calls) == 1:
+            raise OSError(errno.ENOSPC, 'No space left on device')
+        return real_write(fd, bytes(data[:5]))  # short writes
+    monkeypatch.setattr(os, 'write', flaky_write)
+
+    def flushed():
+        # A failed write must not kill the writer thread: flush() would hang.
+        flusher = threading.Thread(target=log.flush, daemon=True)
+        flusher.start()
+        flusher.join(timeout=5)
+        return not flusher.is_alive()
+
+    log.append({'id': 'lost'})
+    assert flushed()
+    log.append({'id': 'a'})
+    log.append({'id': 'b'})
+    assert flushed()
+    log.close()
+    lines = (tmp_path / 'audit.jsonl').read_text().splitlines()
+    assert [json.loads(l)['id'] for l in lines] == ['a', 'b']
+
+
+def test_bearer_token_required_when_configured(tmp_path: Path, monkeypatch):
+    monkeypatch.setenv('MEM_TOKEN', 's3cret')
+    client = make_client(tmp_path / 'memorydb')
+    body = {'project': 'P'}
+    assert client.post('/actions/list_memories', json=body).status_code == 401
+    assert client.post('/actions/list_memories', json=body, headers={'Authorization': 'Bearer nope'}).status_code == 401
+    assert client.post('/actions/list_memories', json=body, headers={'Authorization': 'Bearer s3cret'}).status_code == 200
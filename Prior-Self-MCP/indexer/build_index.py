@@ -3,6 +3,36 @@ import argparse
 import json
 import sqlite3
 from pathlib import Path
+from typing import Iterator
+
+try:
+    # Optional: C-accelerated JSON parsing (pip install orjson).
+    import orjson
+except Exception:
+    orjson = None
+
+
+def _loads(data: bytes):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def iter_jsonl(path: Path) -> Iterator[dict]:
+    """Yield each parseable JSON object in a JSONL file, skipping blank and bad lines."""
+    # Parse straight from bytes: no text-layer decode before the JSON parser.
+    # Iterating the buffered file finds newlines in C and never re-scans a tail.
+    with path.open('rb') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = _loads(line)
+            except Exception:
+                continue
+            if isinstance(obj, dict):
+                yield obj
 
 
 def init_db(db: Path):
@@ -21,6 +51,20 @@ def init_db(db: Path):
           tags TEXT
         );
         CREATE VIRTUAL TABLE IF NOT EXISTS fts_messages USING fts5(text, content='messages', content_rowid='id');
+        -- Keep the external-content FTS index in step with messages.
+        CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+          INSERT INTO fts_messages(rowid, text) VALUES (new.id, new.text);
+        END;
+        CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+          INSERT INTO fts_messages(fts_messages, rowid, text) VALUES ('delete', old.id, old.text);
+        END;
+        CREATE TRIGGER IF NOT EXISTS messages_au AFTER UPDATE ON messages BEGIN
+          INSERT INTO fts_messages(fts_messages, rowid, text) VALUES ('delete', old.id, old.text);
+          INSERT INTO fts_messages(rowid, text) VALUES (new.id, new.text);
+        END;
+        -- list_sessions groups by chat per project; get_chat_context reads one chat in ts order.
+        CREATE INDEX IF NOT EXISTS idx_messages_project_chat_ts ON messages(project, chat_id, ts);
+        CREATE INDEX IF NOT EXISTS idx_messages_chat_ts ON messages(chat_id, ts);
         CREATE TABLE IF NOT EXISTS decisions(
           id INTEGER PRIMARY KEY,
           chat_id TEXT,
@@ -38,30 +82,29 @@ def init_db(db: Path):
 def index_transcripts(home: Path):
     db = home / 'index.sqlite'
     con = init_db(db)
+    # The build runs as one transaction; under WAL, synchronous=NORMAL skips
+    # the fsync on commit without risking corruption.
+    con.execute("PRAGMA synchronous=NORMAL;")
+    con.execute("PRAGMA temp_store=MEMORY;")
+    con.execute("PRAGMA cache_size=-65536;")
     cur = con.cursor()
 
     tdir = home / 'transcripts'
     tdir.mkdir(parents=True, exist_ok=True)
 
     for jf in sorted(tdir.glob('*.jsonl')):
-        with jf.open(encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    obj = json.loads(line)
-                except Exception:
-                    continue
-                tags = ' '.join(obj.get('tags', [])) if obj.get('tags') else ''
-                cur.execute(
-                    "INSERT INTO messages(chat_id, project, ts, role, text, tags) VALUES (?,?,?,?,?,?)",
-                    (obj.get('chat_id'), obj.get('project'), obj.get('ts'), obj.get('role'), obj.get('text'), tags),
-                )
-                rowid = cur.lastrowid
-                cur.execute("INSERT INTO fts_messages(rowid, text) VALUES (?,?)", (rowid, obj.get('text') or ''))
-
+        rows = []
+        for obj in iter_jsonl(jf):
+            tags = ' '.join(obj.get('tags', [])) if obj.get('tags') else ''
+            rows.append((obj.get('chat_id'), obj.get('project'), obj.get('ts'), obj.get('role'), obj.get('text'), tags))
+        # fts_messages is maintained by the messages_ai trigger
+        cur.executemany(
+            "INSERT INTO messages(chat_id, project, ts, role, text, tags) VALUES (?,?,?,?,?,?)",
+            rows,
+        )
     con.commit()
+    # Refresh planner statistics for the indexes above.
+    con.execute("ANALYZE;")
     con.close()
     print(f"Indexed transcripts into {db}")
 
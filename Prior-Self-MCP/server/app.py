@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
 import json
 import os
+import queue
 import sqlite3
 import logging
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List
+from typing import Iterator
 
 try:
     from fastapi import FastAPI, Request
@@ -17,18 +21,88 @@ except Exception as e:
     raise SystemExit(1)
 
 
+# Fixed statement texts, one per query shape, shared by /actions and /mcp so
+# sqlite3's statement cache keeps each one prepared.
+SQL_SEARCH = (
+    "SELECT m.chat_id, m.ts, substr(m.text,1,200) as excerpt "
+    "FROM fts_messages JOIN messages m ON fts_messages.rowid = m.id "
+    "WHERE fts_messages MATCH ? ORDER BY m.ts DESC LIMIT ?"
+)
+SQL_SEARCH_P = (
+    "SELECT m.chat_id, m.ts, substr(m.text,1,200) as excerpt "
+    "FROM fts_messages JOIN messages m ON fts_messages.rowid = m.id "
+    "WHERE fts_messages MATCH ? AND m.project = ? ORDER BY m.ts DESC LIMIT ?"
+)
+SQL_CONTEXT = "SELECT ts, role, text FROM messages WHERE chat_id = ? ORDER BY ts ASC"
+SQL_SESSIONS = (
+    "SELECT chat_id, MIN(ts) as first_ts, MAX(ts) as last_ts, COUNT(*) as message_count "
+    "FROM messages GROUP BY chat_id ORDER BY last_ts DESC"
+)
+SQL_SESSIONS_P = (
+    "SELECT chat_id, MIN(ts) as first_ts, MAX(ts) as last_ts, COUNT(*) as message_count "
+    "FROM messages WHERE project = ? GROUP BY chat_id ORDER BY last_ts DESC"
+)
+
+
 def connect_db(home: Path) -> sqlite3.Connection:
     db = home / 'index.sqlite'
     if not db.exists():
         print(f"Warning: index not found at {db}. Run indexer/build_index.py first.")
-    con = sqlite3.connect(str(db))
+    # Pooled connections move between threads; each is used by one request at a time.
+    con = sqlite3.connect(str(db), check_same_thread=False, cached_statements=256)
     con.row_factory = sqlite3.Row
+    # The server only reads the index (indexer/build_index.py writes it): map
+    # the file into memory, keep FTS pages in a 64 MiB cache and refuse writes.
+    con.execute("PRAGMA mmap_size=268435456")
+    con.execute("PRAGMA cache_size=-65536")
+    con.execute("PRAGMA temp_store=MEMORY")
+    con.execute("PRAGMA query_only=1")
     return con
 
 
+class ConnectionPool:
+    """Up to `size` long-lived read connections to the index.
+
+    Requests borrow a connection instead of sharing one, so concurrent reads
+    do not contend on a single connection and each keeps its page cache warm.
+    """
+
+    def __init__(self, home: Path, size: int = 4):
+        self.home = home
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._size = max(1, size)
+        self._opened = 1
+        self._lock = threading.Lock()
+        self._idle.put(connect_db(home))
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        try:
+            con = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                grow = self._opened < self._size
+                if grow:
+                    self._opened += 1
+            con = connect_db(self.home) if grow else self._idle.get()
+        try:
+            yield con
+        finally:
+            self._idle.put(con)
+
+
 def create_app(home: Path) -> FastAPI:
     app = FastAPI()
-    con = connect_db(home)
+    pool = ConnectionPool(home)
+
+    # sqlite3 blocks, so queries run in worker threads instead of stalling the
+    # event loop (and every other request) for the length of an FTS search.
+    async def fetchall(sql: str, args: tuple = ()) -> list:
+        def call():
+            with pool.connection() as con:
+                return [dict(row) for row in con.execute(sql, args).fetchall()]
+        return await asyncio.to_thread(call)
+
     # Basic logging and optional file logging
     lvl = os.environ.get('PRIOR_LOG_LEVEL', 'INFO').upper()
     logging.basicConfig(level=getattr(logging, lvl, logging.INFO), format='[%(levelname)s] %(message)s')
@@ -83,19 +157,10 @@ def create_app(home: Path) -> FastAPI:
         project = body.get('project')
         k = int(body.get('k', 10))
         # Use FTS table join to search text content
-        sql = (
-            "SELECT m.chat_id, m.ts, substr(m.text,1,200) as excerpt "
-            "FROM fts_messages f JOIN messages m ON f.rowid = m.id "
-            "WHERE f MATCH ?"
-        )
-        args: List[str] = [query]
         if project:
-            sql += " AND m.project = ?"
-            args.append(project)
-        sql += " ORDER BY m.ts DESC LIMIT ?"
-        args.append(str(k))
-        cur = con.execute(sql, args)
-        items = [dict(row) for row in cur.fetchall()]
+            items = await fetchall(SQL_SEARCH_P, (query, project, k))
+        else:
+            items = await fetchall(SQL_SEARCH, (query, k))
         return JSONResponse({'items': items})
 
     @app.post('/actions/get_chat_context')
@@ -106,11 +171,7 @@ def create_app(home: Path) -> FastAPI:
         chat_id = body.get('chat_id')
         if not chat_id:
             return JSONResponse({'error': 'missing chat_id'}, status_code=400)
-        cur = con.execute(
-            "SELECT ts, role, text FROM messages WHERE chat_id = ? ORDER BY ts ASC",
-            (chat_id,),
-        )
-        msgs = [dict(row) for row in cur.fetchall()]
+        msgs = await fetchall(SQL_CONTEXT, (chat_id,))
         return JSONResponse({'messages': msgs})
 
     @app.post('/actions/list_sessions')
@@ -120,15 +181,9 @@ def create_app(home: Path) -> FastAPI:
         body = await req.json()
         project = body.get('project')
         if project:
-            cur = con.execute(
-                "SELECT chat_id, MIN(ts) as first_ts, MAX(ts) as last_ts, COUNT(*) as message_count FROM messages WHERE project = ? GROUP BY chat_id ORDER BY last_ts DESC",
-                (project,),
-            )
+            items = await fetchall(SQL_SESSIONS_P, (project,))
         else:
-            cur = con.execute(
-                "SELECT chat_id, MIN(ts) as first_ts, MAX(ts) as last_ts, COUNT(*) as message_count FROM messages GROUP BY chat_id ORDER BY last_ts DESC"
-            )
-        items = [dict(row) for row in cur.fetchall()]
+            items = await fetchall(SQL_SESSIONS)
         return JSONResponse({'sessions': items})
 
     @app.post('/actions/summarize_decisions')
@@ -326,30 +381,23 @@ def create_app(home: Path) -> FastAPI:
                         query = arguments.get('query') or ''
                         project = arguments.get('project')
                         k = int(arguments.get('k') or 10)
-                        sql = "SELECT chat_id, ts, substr(text,1,200) as excerpt FROM messages WHERE fts_messages MATCH ?"
-                        args: List[str] = [query]
                         if project:
-                            sql = sql + " AND project = ?"
-                            args.append(project)
-                        sql += " ORDER BY ts DESC LIMIT ?"
-                        args.append(str(k))
-                        cur = con.execute(sql, args)
-                        items = [dict(row) for row in cur.fetchall()]
+                            items = await fetchall(SQL_SEARCH_P, (query, project, k))
+                        else:
+                            items = await fetchall(SQL_SEARCH, (query, k))
                         return _mcp_response(msg_id, result=_text_and_structured({'items': items}))
                     elif name == 'get_chat_context':
                         chat_id = arguments.get('chat_id')
                         if not chat_id:
                             return _mcp_response(msg_id, result={'content':[{'type':'text','text':'Error: missing chat_id'}], 'structuredContent': {'error': {'message': 'missing chat_id'}}, 'isError': True})
-                        cur = con.execute("SELECT ts, role, text FROM messages WHERE chat_id = ? ORDER BY ts ASC", (chat_id,))
-                        msgs = [dict(row) for row in cur.fetchall()]
+                        msgs = await fetchall(SQL_CONTEXT, (chat_id,))
                         return _mcp_response(msg_id, result=_text_and_structured({'messages': msgs}))
                     elif name == 'list_sessions':
                         project = arguments.get('project')
                         if project:
-                            cur = con.execute("SELECT chat_id, MIN(ts) as first_ts, MAX(ts) as last_ts, COUNT(*) as message_count FROM messages WHERE project = ? GROUP BY chat_id ORDER BY last_ts DESC", (project,))
+                            items = await fetchall(SQL_SESSIONS_P, (project,))
                         else:
-                            cur = con.execute("SELECT chat_id, MIN(ts) as first_ts, MAX(ts) as last_ts, COUNT(*) as message_count FROM messages GROUP BY chat_id ORDER BY last_ts DESC")
-                        items = [dict(row) for row in cur.fetchall()]
+                            items = await fetchall(SQL_SESSIONS)
                         return _mcp_response(msg_id, result=_text_and_structured({'sessions': items}))
                     elif name == 'summarize_decisions':
                         return _mcp_response(msg_id, result=_text_and_structured({'decisions': [], 'note': 'decision extraction TBD'}))
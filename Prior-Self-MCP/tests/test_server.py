@@ -88,3 +88,13 @@ def test_endpoints_basic(tmp_path: Path):
     assert r.status_code == 200
     assert 'decisions' in r.json()
 
+
+def test_iter_jsonl_skips_bad_lines(tmp_path: Path):
+    root = Path(__file__).resolve().parents[1]
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+    from indexer.build_index import iter_jsonl
+
+    f = tmp_path / 'x.jsonl'
+    f.write_bytes(b'{"text": "caf\xc3\xa9"}\r\n\n  \nnot json\n[1, 2]\n{"text": "\xff"}\n{"text": "last"}')
+    assert [o['text'] for o in iter_jsonl(f)] == ['café', 'last']